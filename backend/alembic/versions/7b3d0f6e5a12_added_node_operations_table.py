@@ -0,0 +1,46 @@
+"""added node_operations table
+
+Durable outbox of user operations for nodes, drained by the scheduler.
+
+Revision ID: 7b3d0f6e5a12
+Revises: c4e1a7d29b6f
+Create Date: 2026-10-17 11:02:09.871530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3d0f6e5a12'
+down_revision: Union[str, None] = 'c4e1a7d29b6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('node_operations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('node_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('user_name', sa.String(), nullable=False),
+    sa.Column('operation', sa.String(), nullable=False),
+    sa.Column('state', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['node_id'], ['nodes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    op.create_index(op.f('ix_node_operations_node_id'), 'node_operations', ['node_id'], unique=False)
+    op.create_index('ix_node_operations_state_next_attempt', 'node_operations', ['state', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_node_operations_state_next_attempt', table_name='node_operations')
+    op.drop_index(op.f('ix_node_operations_node_id'), table_name='node_operations')
+    op.drop_table('node_operations')
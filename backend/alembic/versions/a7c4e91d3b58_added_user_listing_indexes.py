@@ -0,0 +1,31 @@
+"""added user listing indexes
+
+Keyset pages of users sorted by expiry date, and case-insensitive name
+searches, which LIKE can only run on a NOCASE index.
+
+Revision ID: a7c4e91d3b58
+Revises: f3b8d2a64c19
+Create Date: 2026-10-17 17:11:52.630184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e91d3b58'
+down_revision: Union[str, None] = 'f3b8d2a64c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_users_expiry_date_name', 'users', ['expiry_date', 'name'], unique=False)
+    op.create_index('ix_users_name_nocase', 'users', [sa.text('name COLLATE NOCASE')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_name_nocase', table_name='users')
+    op.drop_index('ix_users_expiry_date_name', table_name='users')
@@ -0,0 +1,48 @@
+"""users ids autoincrement
+
+node_users and node_operations refer to users by id, and keep rows of
+deleted users until the nodes have dropped them. Without AUTOINCREMENT
+SQLite hands the id of the last deleted user to the next new one, which
+then inherits those rows. The sequence starts above every id still in use.
+
+Revision ID: b2d6f0c8e417
+Revises: a7c4e91d3b58
+Create Date: 2026-10-18 10:24:07.913562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d6f0c8e417'
+down_revision: Union[str, None] = 'a7c4e91d3b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _recreate_users(autoincrement: bool) -> None:
+    # Reflection would recreate the NOCASE index as a plain one on name
+    op.drop_index('ix_users_name_nocase', table_name='users')
+    with op.batch_alter_table(
+        'users', recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}
+    ):
+        pass
+    op.create_index('ix_users_name_nocase', 'users', [sa.text('name COLLATE NOCASE')], unique=False)
+
+
+def upgrade() -> None:
+    _recreate_users(True)
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'users'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'users', max("
+        "(SELECT coalesce(max(id), 0) FROM users), "
+        "(SELECT coalesce(max(user_id), 0) FROM node_users), "
+        "(SELECT coalesce(max(user_id), 0) FROM node_operations))"
+    )
+
+
+def downgrade() -> None:
+    _recreate_users(False)
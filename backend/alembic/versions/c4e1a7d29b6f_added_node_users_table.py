@@ -0,0 +1,39 @@
+"""added node_users table
+
+Tracks which users exist on which node so that sync only touches the
+placements that have not converged yet.
+
+Revision ID: c4e1a7d29b6f
+Revises: health_sync_fields
+Create Date: 2026-10-17 10:12:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1a7d29b6f'
+down_revision: Union[str, None] = 'health_sync_fields'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('node_users',
+    sa.Column('node_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('user_name', sa.String(), nullable=False),
+    sa.Column('state', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['node_id'], ['nodes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('node_id', 'user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('node_users')
@@ -0,0 +1,49 @@
+"""added node health history tables
+
+Per-minute and per-hour aggregates of node probe results with latency
+histograms, used for latency percentiles and uptime.
+
+Revision ID: e5a9c3f71d08
+Revises: 7b3d0f6e5a12
+Create Date: 2026-10-17 14:26:41.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c3f71d08'
+down_revision: Union[str, None] = '7b3d0f6e5a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('node_health_1h',
+    sa.Column('node_id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('probes', sa.Integer(), nullable=False),
+    sa.Column('up', sa.Integer(), nullable=False),
+    sa.Column('latency_sum', sa.Float(), nullable=False),
+    sa.Column('latency_histogram', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['node_id'], ['nodes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('node_id', 'bucket_start')
+    )
+    op.create_table('node_health_1m',
+    sa.Column('node_id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('probes', sa.Integer(), nullable=False),
+    sa.Column('up', sa.Integer(), nullable=False),
+    sa.Column('latency_sum', sa.Float(), nullable=False),
+    sa.Column('latency_histogram', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['node_id'], ['nodes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('node_id', 'bucket_start')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('node_health_1m')
+    op.drop_table('node_health_1h')
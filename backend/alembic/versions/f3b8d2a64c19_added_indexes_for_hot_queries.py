@@ -0,0 +1,65 @@
+"""added indexes for hot queries
+
+Nodes are looked up by address (unique together with the port) and
+filtered by status, health and sync status; expired users by activity and
+expiry date; unconverged placements by state; and history buckets are
+pruned by bucket start.
+
+Nodes registered more than once on the same address and port would break
+the unique index. The upgrade lists them and stops instead of picking one
+to keep: remove or re-port the extra nodes in the panel, then upgrade
+again.
+
+Revision ID: f3b8d2a64c19
+Revises: e5a9c3f71d08
+Create Date: 2026-10-17 16:02:13.487520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a64c19'
+down_revision: Union[str, None] = 'e5a9c3f71d08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _check_duplicate_nodes() -> None:
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT id, name, address, port FROM nodes WHERE EXISTS ("
+        "SELECT 1 FROM nodes AS other WHERE other.address = nodes.address "
+        "AND other.port = nodes.port AND other.id != nodes.id) "
+        "ORDER BY address, port, id"
+    )).all()
+    if duplicates:
+        rows = "\n".join(
+            f"  id={id} name={name} address={address} port={port}"
+            for id, name, address, port in duplicates
+        )
+        raise RuntimeError(
+            "Nodes share an address and port, remove or change the port of "
+            f"all but one of each before upgrading:\n{rows}"
+        )
+
+
+def upgrade() -> None:
+    _check_duplicate_nodes()
+    op.create_index('ix_nodes_address_port', 'nodes', ['address', 'port'], unique=True)
+    op.create_index('ix_nodes_status_is_healthy_sync_status', 'nodes', ['status', 'is_healthy', 'sync_status'], unique=False)
+    op.create_index('ix_users_is_active_expiry_date', 'users', ['is_active', 'expiry_date'], unique=False)
+    op.create_index('ix_node_users_state_node_id', 'node_users', ['state', 'node_id'], unique=False)
+    op.create_index('ix_node_health_1m_bucket_start', 'node_health_1m', ['bucket_start'], unique=False)
+    op.create_index('ix_node_health_1h_bucket_start', 'node_health_1h', ['bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_node_health_1h_bucket_start', table_name='node_health_1h')
+    op.drop_index('ix_node_health_1m_bucket_start', table_name='node_health_1m')
+    op.drop_index('ix_node_users_state_node_id', table_name='node_users')
+    op.drop_index('ix_users_is_active_expiry_date', table_name='users')
+    op.drop_index('ix_nodes_status_is_healthy_sync_status', table_name='nodes')
+    op.drop_index('ix_nodes_address_port', table_name='nodes')
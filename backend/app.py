@@ -4,15 +4,20 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
 from backend.operations.daily_checks import check_user_expiry_date
+from backend.operations.server_info import server_sampler
 from backend.config import config
 from backend.routers import all_routers
 from backend.version import __version__
 from backend.node.scheduler import scheduler as node_scheduler
+from backend.node.requests import close_clients
 from backend.logger import logger
+from backend.metrics import MetricsMiddleware, instrument_engine, instrument_scheduler
+from backend.db.engine import async_engin, engin, writer_engin
 
 
 api = FastAPI(
@@ -30,6 +35,11 @@ api.mount(
     name="assets",
 )
 
+api.add_middleware(MetricsMiddleware)
+instrument_engine(engin)
+instrument_engine(async_engin.sync_engine)
+instrument_engine(writer_engin)
+
 api.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -48,7 +58,16 @@ def start_scheduler():
         id="check_user_expiry",
         replace_existing=True,
     )
+    scheduler.add_job(
+        server_sampler.sample,
+        IntervalTrigger(seconds=config.SERVER_SAMPLE_INTERVAL),
+        id="server_metrics_sampler",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
 
+    instrument_scheduler(scheduler)
     scheduler.start()
 
 
@@ -73,6 +92,8 @@ async def shutdown_event():
     except Exception as e:
         logger.error(f"Error stopping node scheduler: {e}")
 
+    await close_clients()
+
 
 @api.get(f"/{config.URLPATH}")
 async def serve_react():
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer, APIKeyHeader
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from typing import Optional, Union
-from backend.db.engine import get_db
+from backend.db.engine import get_async_db
 from backend.config import config
-from backend.db import crud
+from backend.db import async_crud, crud
 
 
 ALGORITHM = "HS256"
@@ -45,9 +46,12 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 @router.post("/login")
 async def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)
 ):
-    admin = authenticate_user(db, form_data.username, form_data.password)
+    # Runs with the sync session, off the event loop, bcrypt included
+    admin = await async_crud.run(
+        db, authenticate_user, form_data.username, form_data.password
+    )
     if not admin:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
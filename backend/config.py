@@ -17,6 +17,80 @@ class Setting(BaseSettings):
     JWT_ACCESS_TOKEN_EXPIRES: int = 86400  # in seconds
     API_KEY: Optional[str] = None  # Optional API key for external integrations
 
+    # Database
+    DB_POOL_SIZE: int = 10  # async connections kept open
+    DB_MAX_OVERFLOW: int = 20  # extra async connections under load
+    DB_WRITER_BATCH_SIZE: int = 64  # queued writes committed in one transaction
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # OFF, NORMAL or FULL, NORMAL is durable enough with WAL
+    SQLITE_BUSY_TIMEOUT: int = 5000  # in milliseconds
+    SQLITE_CACHE_SIZE: int = -20000  # pages, negative is in KiB (20 MB)
+    SQLITE_MMAP_SIZE: int = 268435456  # in bytes, 0 disables memory-mapped I/O
+
+    # Server metrics sampler
+    SERVER_SAMPLE_INTERVAL: int = 5  # in seconds
+    SERVER_SAMPLE_HISTORY: int = 720  # samples kept in memory, 1 hour at 5s
+
+    # Node client connection pool
+    NODE_MAX_CONNECTIONS: int = 200  # global cap on in-flight node requests
+    NODE_MAX_CONNECTIONS_PER_HOST: int = 10  # pooled connections per node
+    NODE_KEEPALIVE_EXPIRY: float = 30.0  # in seconds
+    NODE_BATCH_SIZE: int = 200  # users per batched create/delete request
+
+    # Node health probes
+    HEALTH_CHECK_INTERVAL: int = 10  # in seconds, default probe interval
+    HEALTH_MIN_INTERVAL: int = 5  # in seconds, for flapping nodes
+    HEALTH_MAX_INTERVAL: int = 60  # in seconds, for long-stable nodes
+    HEALTH_STABLE_PROBES: int = 6  # same results before backing off
+    HEALTH_MAX_IN_FLIGHT: int = 50  # concurrent probes
+    HEALTH_RESPONSE_TIME_CHANGE: float = 0.25  # relative change before it is saved
+    HEALTH_PERSIST_INTERVAL: int = 300  # in seconds, max age of saved last_health_check
+    HEALTH_HISTORY_MINUTE_RETENTION: int = 2  # in days, per-minute latency/uptime history
+    HEALTH_HISTORY_HOUR_RETENTION: int = 90  # in days, per-hour latency/uptime history
+    NODE_STATUS_TTL: int = 90  # in seconds, above HEALTH_MAX_INTERVAL so probes keep it fresh
+    HEARTBEAT_STALE_AFTER: int = 30  # in seconds, nodes are probed again when heartbeats stop
+
+    # Download node ranking, costs are relative to NODE_RANK_LATENCY_REF of latency
+    NODE_RANK_EWMA_ALPHA: float = 0.3  # weight of the newest latency sample
+    NODE_RANK_LATENCY_REF: float = 0.1  # in seconds, latency costing 1
+    NODE_RANK_CPU_WEIGHT: float = 1.0  # cost of a fully busy CPU
+    NODE_RANK_MEMORY_WEIGHT: float = 0.5  # cost of full memory
+    NODE_RANK_FAILURE_WEIGHT: float = 2.0  # cost per recent failed probe
+    NODE_RANK_CLIENT_WEIGHT: float = 1.0  # cost of the busiest node's clients
+
+    # OVPN downloads from the best node
+    DOWNLOAD_DEADLINE: float = 15.0  # in seconds, across all failover attempts
+    DOWNLOAD_HEDGE: bool = False  # race a second node when the first is slow
+    DOWNLOAD_HEDGE_DELAY: float = 0.5  # in seconds, until a node's p95 is known
+
+    # Node circuit breaker
+    NODE_BREAKER_FAILURE_THRESHOLD: int = 3  # consecutive failures to open
+    NODE_BREAKER_BACKOFF_BASE: float = 10.0  # in seconds, doubled per re-open
+    NODE_BREAKER_BACKOFF_MAX: float = 300.0  # in seconds
+    NODE_BREAKER_PROBE_TIMEOUT: float = 30.0  # in seconds, for a lost half-open probe
+
+    # OVPN profile cache
+    OVPN_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # memory tier size
+    OVPN_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024  # larger profiles are not cached
+    OVPN_CACHE_TTL: int = 86400  # in seconds
+    OVPN_CACHE_DISK: bool = False  # keep profiles under data/ovpn-cache as well
+
+    # Node operation outbox
+    OUTBOX_POLL_INTERVAL: int = 2  # in seconds
+    OUTBOX_BATCH_SIZE: int = 500  # operations claimed per drain
+    OUTBOX_NODE_CONCURRENCY: int = 4  # in-flight operations per node
+    OUTBOX_MAX_ATTEMPTS: int = 8  # before an operation is dead-lettered
+    OUTBOX_BACKOFF_BASE: float = 5.0  # in seconds, doubled per attempt
+    OUTBOX_BACKOFF_MAX: float = 900.0  # in seconds
+    NODE_DELETE_DEADLINE: float = 5.0  # in seconds, inline user deletion on nodes
+
+    # Live dashboard stream
+    LIVE_STREAM_INTERVAL: float = 2.0  # in seconds, between state diffs
+    LIVE_STREAM_QUEUE_SIZE: int = 32  # events buffered per client before a resync
+    LIVE_STREAM_KEEPALIVE: int = 15  # in seconds, comment sent on idle streams
+
+    # User and node exports
+    EXPORT_CHUNK_SIZE: int = 1000  # rows read from the database and sent at a time
+
     class Config:
         env_file = os.path.join(os.path.dirname(__file__), "..", ".env")
 
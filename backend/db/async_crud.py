@@ -0,0 +1,97 @@
+"""Async access to the crud functions for code running on the event loop.
+
+Every function runs its counterpart from crud through AsyncSession.run_sync,
+so the query executes in the aiosqlite connection thread instead of
+blocking the event loop. Calls on one session are serialized, because a
+session must not be used by two tasks at once (e.g. under asyncio.gather).
+
+Functions that write go to the database writer instead of the caller's
+session, which queues them and commits them in batches. They return
+objects of the writer's closed session, with their attributes loaded.
+"""
+
+from typing import Any, Callable
+import asyncio
+import functools
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import crud
+from backend.db.writer import db_writer
+
+
+async def run(db: AsyncSession, fn: Callable, *args, **kwargs) -> Any:
+    """Run ``fn(session, *args, **kwargs)`` with the sync session behind ``db``."""
+    lock = db.info.get("crud_lock")
+    if lock is None:
+        lock = db.info["crud_lock"] = asyncio.Lock()
+    async with lock:
+        return await db.run_sync(fn, *args, **kwargs)
+
+
+def _async(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await run(db, fn, *args, **kwargs)
+
+    return wrapper
+
+
+async def write(fn: Callable, *args, **kwargs) -> Any:
+    """Run ``fn(session, *args, **kwargs)`` in a transaction of the writer."""
+    return await db_writer.run(fn, *args, **kwargs)
+
+
+def _write(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await write(fn, *args, **kwargs)
+
+    return wrapper
+
+
+get_all_users = _async(crud.get_all_users)
+get_users_page = _async(crud.get_users_page)
+count_users = _async(crud.count_users)
+get_user_by_name = _async(crud.get_user_by_name)
+create_user = _write(crud.create_user)
+update_user = _write(crud.update_user)
+change_user_status = _write(crud.change_user_status)
+get_expired_users = _async(crud.get_expired_users)
+delete_user = _write(crud.delete_user)
+get_all_admins = _async(crud.get_all_admins)
+it_is_admin = _async(crud.it_is_admin)
+get_all_nodes = _async(crud.get_all_nodes)
+get_node_by_id = _async(crud.get_node_by_id)
+get_nodes_by_ids = _async(crud.get_nodes_by_ids)
+get_node_by_address = _async(crud.get_node_by_address)
+get_node_by_address_and_port = _async(crud.get_node_by_address_and_port)
+create_node = _write(crud.create_node)
+update_node = _write(crud.update_node)
+delete_node = _write(crud.delete_node)
+get_settings = _async(crud.get_settings)
+update_settings = _write(crud.update_settings)
+update_node_health = _write(crud.update_node_health)
+update_node_sync_status = _write(crud.update_node_sync_status)
+get_healthy_nodes = _async(crud.get_healthy_nodes)
+get_nodes_needing_sync = _async(crud.get_nodes_needing_sync)
+get_download_candidate_nodes = _async(crud.get_download_candidate_nodes)
+get_node_users = _async(crud.get_node_users)
+get_node_user = _async(crud.get_node_user)
+count_node_users = _async(crud.count_node_users)
+get_nodes_with_unconverged_users = _async(crud.get_nodes_with_unconverged_users)
+set_node_users_state = _write(crud.set_node_users_state)
+delete_node_users = _write(crud.delete_node_users)
+enqueue_node_operations = _write(crud.enqueue_node_operations)
+cancel_node_operations = _write(crud.cancel_node_operations)
+claim_node_operations = _write(crud.claim_node_operations)
+set_node_operations_state = _write(crud.set_node_operations_state)
+requeue_running_node_operations = _write(crud.requeue_running_node_operations)
+requeue_dead_node_operations = _write(crud.requeue_dead_node_operations)
+get_node_operation_user_ids = _async(crud.get_node_operation_user_ids)
+get_dead_node_operations = _async(crud.get_dead_node_operations)
+get_node_operation_stats = _async(crud.get_node_operation_stats)
+add_node_health_buckets = _write(crud.add_node_health_buckets)
+get_node_health_buckets = _async(crud.get_node_health_buckets)
+get_last_node_health_bucket_start = _async(crud.get_last_node_health_bucket_start)
+delete_node_health_buckets_before = _write(crud.delete_node_health_buckets_before)
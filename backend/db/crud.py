@@ -1,11 +1,30 @@
+from sqlalchemy import case, exists, func, tuple_
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import base64
+import binascii
+import json
 
 from backend.logger import logger
 from backend.schema.output import Users as ShowUsers
-from backend.schema._input import CreateUser, UpdateUser, NodeCreate, SettingsUpdate
-from .models import User, Admin, Node, Settings
+from backend.schema._input import (
+    CreateUser,
+    UpdateUser,
+    UserFilter,
+    NodeCreate,
+    SettingsUpdate,
+)
+from .models import (
+    User,
+    Admin,
+    Node,
+    NodeHealthHour,
+    NodeHealthMinute,
+    NodeOperation,
+    NodeUser,
+    Settings,
+)
 
 
 def get_all_users(db: Session):
@@ -13,6 +32,85 @@ def get_all_users(db: Session):
     return users
 
 
+def _filter_users(query, filters: UserFilter):
+    if filters.is_active is not None:
+        query = query.filter(User.is_active == filters.is_active)
+    if filters.owner:
+        query = query.filter(User.owner == filters.owner)
+    if filters.expiring_in_days is not None:
+        today = date.today()
+        query = query.filter(
+            User.expiry_date >= today,
+            User.expiry_date <= today + timedelta(days=filters.expiring_in_days),
+        )
+    if filters.search:
+        pattern = (
+            filters.search.replace("\\", "\\\\")
+            .replace("%", "\\%")
+            .replace("_", "\\_")
+        )
+        pattern = f"{pattern}%" if filters.match == "prefix" else f"%{pattern}%"
+        query = query.filter(User.name.like(pattern, escape="\\"))
+    return query
+
+
+def _encode_user_cursor(user: User, sort: str) -> str:
+    key = [user.name] if sort == "name" else [user.expiry_date.isoformat(), user.name]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_user_cursor(cursor: str, sort: str):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == "name":
+            (name,) = key
+            return str(name)
+        expiry_date, name = key
+        return date.fromisoformat(expiry_date), str(name)
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def get_users_page(
+    db: Session,
+    filters: UserFilter,
+    limit: int,
+    sort: str = "name",
+    descending: bool = False,
+    cursor: str = None,
+):
+    """Get a page of users matching filters and the cursor of the next page.
+
+    Users are ordered by ``sort`` (name or expiry_date, then name) and the
+    page starts after ``cursor``, the next cursor of the previous page, so
+    every page is an index seek. The next cursor is None on the last page.
+    """
+    columns = [User.name] if sort == "name" else [User.expiry_date, User.name]
+    query = _filter_users(db.query(User), filters)
+    if cursor:
+        key = columns[0] if sort == "name" else tuple_(*columns)
+        after = _decode_user_cursor(cursor, sort)
+        query = query.filter(key < after if descending else key > after)
+    users = (
+        query.order_by(*(column.desc() if descending else column for column in columns))
+        .limit(limit + 1)
+        .all()
+    )
+
+    if len(users) <= limit:
+        return users, None
+    return users[:limit], _encode_user_cursor(users[limit - 1], sort)
+
+
+def count_users(db: Session, filters: UserFilter) -> dict:
+    """Count users matching filters, in total and active."""
+    total, active = _filter_users(
+        db.query(func.count(User.id), func.sum(case((User.is_active == True, 1), else_=0))),
+        filters,
+    ).one()
+    return {"total": total, "active": active or 0}
+
+
 def get_user_by_name(db: Session, name: str):
     user = db.query(User).filter(User.name == name).first()
     if user:
@@ -103,11 +201,41 @@ def get_node_by_id(db: Session, node_id: int):
     return db.query(Node).filter(Node.id == node_id).first()
 
 
-def get_node_by_address(db: Session, address: str):
-    return db.query(Node).filter(Node.address == address).first()
+def get_nodes_by_ids(db: Session, node_ids: list):
+    nodes = []
+    for i in range(0, len(node_ids), 500):
+        nodes.extend(
+            db.query(Node).filter(Node.id.in_(node_ids[i : i + 500])).all()
+        )
+    return nodes
+
+
+def get_node_by_address(db: Session, address: str, port: int = None):
+    """The node at address, on port when given.
+
+    Nodes on one host share the address, so without a port the address
+    must match a single node.
+    """
+    if port is not None:
+        return get_node_by_address_and_port(db, address, port)
+    nodes = db.query(Node).filter(Node.address == address).limit(2).all()
+    if len(nodes) > 1:
+        raise HTTPException(
+            status_code=409, detail="several nodes share this address, pass the port"
+        )
+    return nodes[0] if nodes else None
+
+
+def get_node_by_address_and_port(db: Session, address: str, port: int):
+    return db.query(Node).filter(Node.address == address, Node.port == port).first()
 
 
 def create_node(db: Session, request: NodeCreate):
+    if get_node_by_address_and_port(db, request.address, request.port):
+        raise HTTPException(
+            status_code=400, detail="node with this address and port already exists"
+        )
+
     new_node = Node(
         name=request.name,
         address=request.address,
@@ -125,10 +253,16 @@ def create_node(db: Session, request: NodeCreate):
     return new_node
 
 
-def update_node(db: Session, address: str, request: NodeCreate):
-    node = db.query(Node).filter(Node.address == address).first()
+def update_node(db: Session, id: int, request: NodeCreate):
+    node = db.query(Node).filter(Node.id == id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
+    if request.port != node.port and get_node_by_address_and_port(
+        db, node.address, request.port
+    ):
+        raise HTTPException(
+            status_code=400, detail="node with this address and port already exists"
+        )
 
     node.name = request.name
     node.tunnel_address = request.tunnel_address
@@ -146,6 +280,10 @@ def delete_node(db: Session, id: int):
     node = db.query(Node).filter(Node.id == id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
+    db.query(NodeUser).filter(NodeUser.node_id == id).delete()
+    db.query(NodeOperation).filter(NodeOperation.node_id == id).delete()
+    db.query(NodeHealthMinute).filter(NodeHealthMinute.node_id == id).delete()
+    db.query(NodeHealthHour).filter(NodeHealthHour.node_id == id).delete()
     db.delete(node)
     db.commit()
     return {"detail": "Node deleted successfully"}
@@ -238,18 +376,15 @@ def get_nodes_needing_sync(db: Session):
         .filter(
             Node.status == True,
             Node.is_healthy == True,
-            Node.sync_status.in_(["pending", "failed", "never_synced"])
+            Node.sync_status.in_(["pending", "failed", "never_synced", "drifted"])
         )
         .all()
     )
 
 
-def get_best_node_for_download(db: Session):
-    """Get the best node for downloading OVPN based on health and performance."""
-    from sqlalchemy import func
-    
-    # Get healthy nodes sorted by response time
-    node = (
+def get_download_candidate_nodes(db: Session):
+    """Get the nodes eligible for downloading OVPN, to be ranked by the caller."""
+    nodes = (
         db.query(Node)
         .filter(
             Node.status == True,
@@ -257,12 +392,311 @@ def get_best_node_for_download(db: Session):
             Node.sync_status == "synced",
             Node.consecutive_failures == 0
         )
-        .order_by(Node.response_time.asc())
-        .first()
+        .all()
     )
     
-    if not node:
+    if not nodes:
         # Fallback to any active node
-        node = db.query(Node).filter(Node.status == True).first()
+        nodes = db.query(Node).filter(Node.status == True).all()
     
-    return node
+    return nodes
+
+
+# Node user placement
+def get_node_users(db: Session, node_id: int, states: list = None):
+    """Get user placements of a node, optionally filtered by state."""
+    query = db.query(NodeUser).filter(NodeUser.node_id == node_id)
+    if states:
+        query = query.filter(NodeUser.state.in_(states))
+    return query.all()
+
+
+def get_node_user(db: Session, node_id: int, user_id: int):
+    return (
+        db.query(NodeUser)
+        .filter(NodeUser.node_id == node_id, NodeUser.user_id == user_id)
+        .first()
+    )
+
+
+def count_node_users(db: Session, node_id: int) -> int:
+    """Count tracked user placements of a node."""
+    return db.query(NodeUser).filter(NodeUser.node_id == node_id).count()
+
+
+def get_nodes_with_unconverged_users(db: Session):
+    """Get healthy, active nodes that have placements not yet converged."""
+    unconverged = db.query(NodeUser.node_id).filter(
+        NodeUser.state.in_(["pending", "failed", "deleting"])
+    )
+    return (
+        db.query(Node)
+        .filter(
+            Node.status == True,
+            Node.is_healthy == True,
+            Node.id.in_(unconverged),
+        )
+        .all()
+    )
+
+
+def set_node_users_state(
+    db: Session,
+    node_id: int,
+    users: list,
+    state: str,
+    error: str = None,
+    count_attempt: bool = False,
+):
+    """Insert or update placements of (user_id, user_name) pairs on a node.
+    
+    ``count_attempt`` increments the attempt counter (used for failures);
+    reaching "present" resets it.
+    """
+    if not users:
+        return
+
+    user_ids = [user_id for user_id, _ in users]
+    rows = {}
+    for i in range(0, len(user_ids), 500):
+        for row in db.query(NodeUser).filter(
+            NodeUser.node_id == node_id,
+            NodeUser.user_id.in_(user_ids[i : i + 500]),
+        ):
+            rows[row.user_id] = row
+    now = datetime.now()
+
+    for user_id, user_name in users:
+        row = rows.get(user_id)
+        if row is None:
+            row = NodeUser(node_id=node_id, user_id=user_id, attempts=0)
+            db.add(row)
+            rows[user_id] = row
+
+        row.user_name = user_name
+        row.state = state
+        row.last_error = error
+        row.updated_at = now
+        if count_attempt:
+            row.attempts += 1
+        elif state == "present":
+            row.attempts = 0
+
+    db.commit()
+
+
+def delete_node_users(db: Session, node_id: int, user_ids: list):
+    """Forget placements of users that no longer exist on a node."""
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), 500):
+        db.query(NodeUser).filter(
+            NodeUser.node_id == node_id,
+            NodeUser.user_id.in_(user_ids[i : i + 500]),
+        ).delete()
+    db.commit()
+
+
+# Node operation outbox
+def enqueue_node_operations(db: Session, operations: list):
+    """Queue node operations given as dicts of NodeOperation fields."""
+    now = datetime.now()
+    rows = [
+        NodeOperation(
+            **operation,
+            state="queued",
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+        )
+        for operation in operations
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def cancel_node_operations(
+    db: Session, node_id: int, user_name: str, operation: str
+) -> int:
+    """Drop queued and dead-lettered operations of a kind for a user on a node."""
+    operations = (
+        db.query(NodeOperation)
+        .filter(
+            NodeOperation.node_id == node_id,
+            NodeOperation.user_name == user_name,
+            NodeOperation.operation == operation,
+            NodeOperation.state.in_(["queued", "dead"]),
+        )
+        .all()
+    )
+    for queued in operations:
+        db.delete(queued)
+    db.commit()
+    return len(operations)
+
+
+def _drop_orphan_creates(db: Session, state: str) -> int:
+    """Delete create operations in a state whose user no longer exists."""
+    count = (
+        db.query(NodeOperation)
+        .filter(
+            NodeOperation.state == state,
+            NodeOperation.operation == "create",
+            ~exists().where(User.id == NodeOperation.user_id),
+        )
+        .delete(synchronize_session=False)
+    )
+    if count:
+        logger.info(f"Dropped {count} {state} create operations of deleted users")
+    return count
+
+
+def claim_node_operations(db: Session, limit: int):
+    """Mark due operations of healthy, active nodes as running and return them.
+
+    Creates of users deleted since they were queued are dropped instead.
+    """
+    _drop_orphan_creates(db, "queued")
+    operations = (
+        db.query(NodeOperation)
+        .join(Node, Node.id == NodeOperation.node_id)
+        .filter(
+            NodeOperation.state == "queued",
+            NodeOperation.next_attempt_at <= datetime.now(),
+            Node.status == True,
+            Node.is_healthy == True,
+        )
+        .order_by(NodeOperation.id)
+        .limit(limit)
+        .all()
+    )
+    for operation in operations:
+        operation.state = "running"
+    db.commit()
+    return operations
+
+
+def set_node_operations_state(db: Session, operation_ids: list, state: str) -> int:
+    """Move operations to a state by id."""
+    count = (
+        db.query(NodeOperation)
+        .filter(NodeOperation.id.in_(operation_ids))
+        .update({NodeOperation.state: state}, synchronize_session=False)
+    )
+    db.commit()
+    return count
+
+
+def requeue_running_node_operations(db: Session) -> int:
+    """Put operations left running by a previous process back in the queue."""
+    count = (
+        db.query(NodeOperation)
+        .filter(NodeOperation.state == "running")
+        .update({NodeOperation.state: "queued"}, synchronize_session=False)
+    )
+    db.commit()
+    return count
+
+
+def requeue_dead_node_operations(db: Session) -> int:
+    """Give dead-lettered operations a fresh set of attempts.
+
+    Creates of users deleted since then are dropped, not requeued.
+    """
+    _drop_orphan_creates(db, "dead")
+    count = (
+        db.query(NodeOperation)
+        .filter(NodeOperation.state == "dead")
+        .update(
+            {
+                NodeOperation.state: "queued",
+                NodeOperation.attempts: 0,
+                NodeOperation.next_attempt_at: datetime.now(),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return count
+
+
+def get_node_operation_user_ids(db: Session, node_id: int, states: list) -> set:
+    """Ids of users with an operation in one of the states on a node."""
+    rows = (
+        db.query(NodeOperation.user_id)
+        .filter(NodeOperation.node_id == node_id, NodeOperation.state.in_(states))
+        .all()
+    )
+    return {user_id for user_id, in rows}
+
+
+def get_dead_node_operations(db: Session, limit: int = 100):
+    return (
+        db.query(NodeOperation)
+        .filter(NodeOperation.state == "dead")
+        .order_by(NodeOperation.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def get_node_operation_stats(db: Session):
+    """Count operations per node and state with the oldest creation time."""
+    return (
+        db.query(
+            NodeOperation.node_id,
+            NodeOperation.state,
+            func.count(NodeOperation.id),
+            func.min(NodeOperation.created_at),
+        )
+        .group_by(NodeOperation.node_id, NodeOperation.state)
+        .all()
+    )
+
+
+# node health history crud
+def add_node_health_buckets(db: Session, model, buckets: list):
+    """Merge aggregated probe buckets into a history table (node_health_1m/1h).
+
+    Buckets are dicts with node_id, bucket_start, probes, up, latency_sum and
+    latency_histogram; counts are added to an existing row with the same key.
+    """
+    for bucket in buckets:
+        row = db.get(model, (bucket["node_id"], bucket["bucket_start"]))
+        if row is None:
+            db.add(model(**bucket))
+            continue
+        row.probes += bucket["probes"]
+        row.up += bucket["up"]
+        row.latency_sum += bucket["latency_sum"]
+        row.latency_histogram = [
+            a + b for a, b in zip(row.latency_histogram, bucket["latency_histogram"])
+        ]
+    db.commit()
+
+
+def get_node_health_buckets(
+    db: Session, model, start: datetime, end: datetime, node_id: int = None
+):
+    """History buckets with start <= bucket_start < end, optionally of one node."""
+    query = db.query(model).filter(
+        model.bucket_start >= start, model.bucket_start < end
+    )
+    if node_id is not None:
+        query = query.filter(model.node_id == node_id)
+    return query.order_by(model.node_id, model.bucket_start).all()
+
+
+def get_last_node_health_bucket_start(db: Session, model):
+    return db.query(func.max(model.bucket_start)).scalar()
+
+
+def delete_node_health_buckets_before(db: Session, model, before: datetime) -> int:
+    """Drop history buckets older than the retention window."""
+    count = (
+        db.query(model)
+        .filter(model.bucket_start < before)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return count
@@ -1,16 +1,72 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from pathlib import Path
 
+from backend.config import config
+
 BASE_DIR = Path(__file__).resolve().parent
 
+
+def configure_sqlite(engine, writer: bool = False) -> None:
+    """Apply the SQLite profile to every connection of ``engine``.
+
+    WAL lets readers run next to the single writer. The writer's
+    connection manages its own transactions, which makes savepoints work
+    and takes the write lock up front with BEGIN IMMEDIATE.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        if writer:
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA cache_size={config.SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+    if writer:
+
+        @event.listens_for(engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
 DATABASE_URL = f"sqlite:///{BASE_DIR.parent.parent}/data/ov-panel.db"
 engin = create_engine(url=DATABASE_URL, connect_args={"check_same_thread": False})
+configure_sqlite(engin)
+
+# Same database through aiosqlite, for code running on the event loop
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{BASE_DIR.parent.parent}/data/ov-panel.db"
+async_engin = create_async_engine(
+    url=ASYNC_DATABASE_URL,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+)
+configure_sqlite(async_engin.sync_engine)
+
+# The one connection writes go through, used from the writer's thread,
+# see backend/db/writer.py
+writer_engin = create_engine(
+    url=DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0,
+)
+configure_sqlite(writer_engin, writer=True)
 
 Base = declarative_base()
 
 sessionLocal = sessionmaker(bind=engin, autoflush=False)
 
+# Loaded objects stay readable after commit, async code cannot lazy-load them
+asyncSessionLocal = async_sessionmaker(
+    bind=async_engin, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db():
     db = sessionLocal()
@@ -18,3 +74,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with asyncSessionLocal() as db:
+        yield db
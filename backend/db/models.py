@@ -1,3 +1,4 @@
+from sqlalchemy import JSON, ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from .engine import Base
 from datetime import date, datetime
@@ -6,6 +7,14 @@ from typing import Optional
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_is_active_expiry_date", "is_active", "expiry_date"),
+        Index("ix_users_expiry_date_name", "expiry_date", "name"),
+        # Case-insensitive like LIKE, so name searches can seek it
+        Index("ix_users_name_nocase", text("name COLLATE NOCASE")),
+        # Ids are never reused, placements of deleted users still refer to them
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(unique=True)
@@ -24,6 +33,10 @@ class Admin(Base):
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = (
+        Index("ix_nodes_address_port", "address", "port", unique=True),
+        Index("ix_nodes_status_is_healthy_sync_status", "status", "is_healthy", "sync_status"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column()
@@ -43,7 +56,80 @@ class Node(Base):
     
     # Sync fields
     last_sync_time: Mapped[Optional[datetime]] = mapped_column(nullable=True)
-    sync_status: Mapped[str] = mapped_column(default="synced")  # synced, pending, failed, never_synced
+    sync_status: Mapped[str] = mapped_column(default="synced")  # synced, pending, failed, never_synced, drifted
+
+
+class NodeUser(Base):
+    """Placement of a user on a node and its convergence state."""
+
+    __tablename__ = "node_users"
+    __table_args__ = (Index("ix_node_users_state_node_id", "state", "node_id"),)
+
+    node_id: Mapped[int] = mapped_column(
+        ForeignKey("nodes.id", ondelete="CASCADE"), primary_key=True
+    )
+    # No foreign key: "deleting" rows must outlive the users row
+    user_id: Mapped[int] = mapped_column(primary_key=True)
+    user_name: Mapped[str] = mapped_column()
+    state: Mapped[str] = mapped_column(default="pending")  # pending, present, deleting, failed
+    attempts: Mapped[int] = mapped_column(default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+
+
+class NodeOperation(Base):
+    """Queued user operation for a node (outbox), drained by the scheduler."""
+
+    __tablename__ = "node_operations"
+    __table_args__ = (
+        Index("ix_node_operations_state_next_attempt", "state", "next_attempt_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    node_id: Mapped[int] = mapped_column(
+        ForeignKey("nodes.id", ondelete="CASCADE"), index=True
+    )
+    user_id: Mapped[Optional[int]] = mapped_column(nullable=True)
+    user_name: Mapped[str] = mapped_column()
+    operation: Mapped[str] = mapped_column()  # create, delete
+    state: Mapped[str] = mapped_column(default="queued")  # queued, running, dead
+    attempts: Mapped[int] = mapped_column(default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column()
+    last_error: Mapped[Optional[str]] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column()
+
+
+class NodeHealthMinute(Base):
+    """Probe results of a node aggregated per minute."""
+
+    __tablename__ = "node_health_1m"
+    __table_args__ = (Index("ix_node_health_1m_bucket_start", "bucket_start"),)
+
+    node_id: Mapped[int] = mapped_column(
+        ForeignKey("nodes.id", ondelete="CASCADE"), primary_key=True
+    )
+    bucket_start: Mapped[datetime] = mapped_column(primary_key=True)
+    probes: Mapped[int] = mapped_column(default=0)
+    up: Mapped[int] = mapped_column(default=0)  # probes that found the node healthy
+    latency_sum: Mapped[float] = mapped_column(default=0.0)  # in seconds
+    latency_histogram: Mapped[list] = mapped_column(JSON)  # counts per LATENCY_BOUNDS
+
+
+class NodeHealthHour(Base):
+    """Probe results of a node aggregated per hour, rolled up from minutes."""
+
+    __tablename__ = "node_health_1h"
+    __table_args__ = (Index("ix_node_health_1h_bucket_start", "bucket_start"),)
+
+    node_id: Mapped[int] = mapped_column(
+        ForeignKey("nodes.id", ondelete="CASCADE"), primary_key=True
+    )
+    bucket_start: Mapped[datetime] = mapped_column(primary_key=True)
+    probes: Mapped[int] = mapped_column(default=0)
+    up: Mapped[int] = mapped_column(default=0)  # probes that found the node healthy
+    latency_sum: Mapped[float] = mapped_column(default=0.0)  # in seconds
+    latency_histogram: Mapped[list] = mapped_column(JSON)  # counts per LATENCY_BOUNDS
 
 
 class Settings(Base):
@@ -0,0 +1,113 @@
+"""Single writer for the SQLite database.
+
+SQLite allows one writer at a time. Instead of letting every session race
+for the write lock (and wait on busy_timeout or fail with "database is
+locked"), writes are queued to one task that runs them on the writer connection, in a
+thread of its own so a whole transaction costs the event loop one hop.
+Whatever queued up while the previous transaction was committing is
+written in the next one, up to DB_WRITER_BATCH_SIZE writes per commit.
+
+Each write runs in its own savepoint, so a failing write is rolled back
+and raised to its caller without affecting the rest of the batch. The
+commits crud functions make only flush in the writer's session; the batch
+commits once at the end.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional
+import asyncio
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.config import config
+from backend.db.engine import writer_engin
+from backend.logger import logger
+from backend.metrics import DB_WRITER_BATCH_SIZE
+
+
+class BatchSession(Session):
+    """Session of the writer, commits inside a write only flush."""
+
+    def commit(self) -> None:
+        self.flush()
+
+
+# Loaded objects are handed back to callers, keep them readable
+writerSessionLocal = sessionmaker(
+    bind=writer_engin,
+    class_=BatchSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+class DatabaseWriter:
+    """Queue of write functions committed in batches by one task."""
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self._pending: Deque[tuple] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self.batches = 0
+        self.writes = 0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run ``fn(session, *args, **kwargs)`` in the writer's next transaction."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((fn, args, kwargs, future))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch = [
+                    self._pending.popleft()
+                    for _ in range(min(self.batch_size, len(self._pending)))
+                ]
+                try:
+                    outcomes = await loop.run_in_executor(self._thread, self._write, batch)
+                except Exception as e:
+                    logger.error(f"Database write of {len(batch)} changes failed: {e}")
+                    outcomes = [(False, e)] * len(batch)
+
+                self.batches += 1
+                self.writes += len(batch)
+                DB_WRITER_BATCH_SIZE.observe(len(batch))
+                for (_, _, _, future), (ok, value) in zip(batch, outcomes):
+                    if future.done():
+                        continue
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+        finally:
+            self._task = None
+
+    @staticmethod
+    def _write(batch: list) -> list:
+        outcomes = []
+        with writerSessionLocal() as session:
+            for fn, args, kwargs, _ in batch:
+                try:
+                    with session.begin_nested():
+                        outcomes.append((True, fn(session, *args, **kwargs)))
+                except Exception as e:
+                    outcomes.append((False, e))
+            Session.commit(session)
+        return outcomes
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._pending),
+            "batches": self.batches,
+            "writes": self.writes,
+        }
+
+
+# Global writer instance
+db_writer = DatabaseWriter(batch_size=config.DB_WRITER_BATCH_SIZE)
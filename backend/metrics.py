@@ -0,0 +1,165 @@
+"""Prometheus metrics of the panel, served at /api/metrics.
+
+Hot paths only observe into preallocated histograms and counters; the
+text exposition is rendered when the endpoint is scraped.
+"""
+
+from datetime import datetime, timezone
+import time
+
+from apscheduler.events import (
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+)
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from sqlalchemy import event
+
+
+API_REQUEST_SECONDS = Histogram(
+    "ovpanel_api_request_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+)
+NODE_REQUEST_SECONDS = Histogram(
+    "ovpanel_node_request_seconds",
+    "Latency of requests to node agents",
+    ["node", "operation"],
+)
+NODE_REQUEST_ERRORS = Counter(
+    "ovpanel_node_request_errors_total",
+    "Node requests that failed with no response or a 5xx, after retries",
+    ["node", "operation"],
+)
+SYNC_JOB_SECONDS = Histogram(
+    "ovpanel_sync_job_seconds",
+    "Duration of node sync runs",
+    ["job"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+SYNC_USERS = Counter(
+    "ovpanel_sync_users_total",
+    "User creates and deletes sent to nodes by sync runs",
+    ["job", "result"],
+)
+SCHEDULER_JOB_LAG_SECONDS = Histogram(
+    "ovpanel_scheduler_job_lag_seconds",
+    "Delay between a job's scheduled and actual start",
+    ["job"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60),
+)
+SCHEDULER_JOB_OVERLAPS = Counter(
+    "ovpanel_scheduler_job_overlaps_total",
+    "Job runs skipped because the previous run was still going",
+    ["job"],
+)
+SCHEDULER_JOB_MISSED = Counter(
+    "ovpanel_scheduler_job_missed_total",
+    "Job runs missed past their grace time",
+    ["job"],
+)
+SCRIPT_SECONDS = Histogram(
+    "ovpanel_script_seconds",
+    "Duration of OpenVPN scripts driven through pexpect",
+    ["script"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 180, 300),
+)
+DB_TRANSACTION_SECONDS = Histogram(
+    "ovpanel_db_transaction_seconds",
+    "Database transaction time from begin to commit or rollback",
+    ["outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_WRITER_BATCH_SIZE = Histogram(
+    "ovpanel_db_writer_batch_size",
+    "Writes committed together by the database writer",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing API request latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope.get("route")
+            API_REQUEST_SECONDS.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+            ).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine) -> None:
+    """Time every transaction of ``engine``."""
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.info["metrics_begin"] = time.perf_counter()
+
+    def _end(outcome):
+        child = DB_TRANSACTION_SECONDS.labels(outcome)
+
+        def observe(conn):
+            started = conn.info.pop("metrics_begin", None)
+            if started is not None:
+                child.observe(time.perf_counter() - started)
+
+        return observe
+
+    event.listen(engine, "commit", _end("commit"))
+    event.listen(engine, "rollback", _end("rollback"))
+
+
+def instrument_scheduler(scheduler) -> None:
+    """Record start lag, overlaps and misses of an APScheduler's jobs."""
+
+    def listener(job_event):
+        if job_event.code == EVENT_JOB_SUBMITTED:
+            now = datetime.now(timezone.utc)
+            for run_time in job_event.scheduled_run_times:
+                SCHEDULER_JOB_LAG_SECONDS.labels(job_event.job_id).observe(
+                    max((now - run_time).total_seconds(), 0)
+                )
+        elif job_event.code == EVENT_JOB_MAX_INSTANCES:
+            SCHEDULER_JOB_OVERLAPS.labels(job_event.job_id).inc()
+        else:
+            SCHEDULER_JOB_MISSED.labels(job_event.job_id).inc()
+
+    scheduler.add_listener(
+        listener, EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED
+    )
+
+
+def record_sync(job: str, seconds: float, results: list) -> None:
+    """Record a sync run and the users it pushed or failed to push.
+
+    Users already in sync are not counted, only creates and deletes.
+    """
+    SYNC_JOB_SECONDS.labels(job).observe(seconds)
+    SYNC_USERS.labels(job, "pushed").inc(
+        sum(r.get("created", 0) + r.get("deleted", 0) for r in results)
+    )
+    SYNC_USERS.labels(job, "failed").inc(sum(r.get("failed", 0) for r in results))
+
+
+def render() -> tuple:
+    """Metrics in the Prometheus text format, with their content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,133 @@
+"""Per-node circuit breakers shared by every NodeRequests instance.
+
+A node's breaker opens after NODE_BREAKER_FAILURE_THRESHOLD consecutive
+failures; while open, requests to it fail immediately without touching the
+network. Once the backoff expires a single half-open probe is let through:
+success closes the breaker, failure re-opens it with twice the backoff
+(plus jitter), up to NODE_BREAKER_BACKOFF_MAX.
+"""
+
+from typing import Dict, List, Optional
+import random
+import time
+
+from backend.config import config
+from backend.logger import logger
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Circuit breaker state of a single node address."""
+
+    def __init__(
+        self,
+        address: str,
+        failure_threshold: int,
+        backoff_base: float,
+        backoff_max: float,
+        probe_timeout: float,
+    ):
+        self.address = address
+        self.failure_threshold = failure_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.open_count = 0
+        self.retry_at = 0.0
+        self.probe_started_at: Optional[float] = None
+
+    def _backoff(self) -> float:
+        delay = min(self.backoff_base * (2 ** (self.open_count - 1)), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.open_count += 1
+        self.probe_started_at = None
+        backoff = self._backoff()
+        self.retry_at = time.monotonic() + backoff
+        logger.warning(
+            f"Circuit opened for node {self.address} after {self.failures} failures, "
+            f"next probe in {backoff:.1f}s"
+        )
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent to the node right now."""
+        if self.state == CLOSED:
+            return True
+
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now < self.retry_at:
+                return False
+            self.state = HALF_OPEN
+            self.probe_started_at = now
+            return True
+
+        # Half-open: one probe at a time, unless the probe got lost
+        if self.probe_started_at and now - self.probe_started_at < self.probe_timeout:
+            return False
+        self.probe_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"Circuit closed for node {self.address}")
+        self.state = CLOSED
+        self.failures = 0
+        self.open_count = 0
+        self.probe_started_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED and self.failures >= self.failure_threshold
+        ):
+            self._open()
+
+    def snapshot(self) -> dict:
+        return {
+            "address": self.address,
+            "state": self.state,
+            "failures": self.failures,
+            "open_count": self.open_count,
+            "retry_in": (
+                round(max(self.retry_at - time.monotonic(), 0), 1)
+                if self.state == OPEN
+                else None
+            ),
+        }
+
+
+# Breakers by node address ("host:port")
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(address: str) -> CircuitBreaker:
+    """Return the breaker of a node, creating it on first use."""
+    breaker = _breakers.get(address)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            address,
+            failure_threshold=config.NODE_BREAKER_FAILURE_THRESHOLD,
+            backoff_base=config.NODE_BREAKER_BACKOFF_BASE,
+            backoff_max=config.NODE_BREAKER_BACKOFF_MAX,
+            probe_timeout=config.NODE_BREAKER_PROBE_TIMEOUT,
+        )
+        _breakers[address] = breaker
+    return breaker
+
+
+def reset_breaker(address: str) -> None:
+    """Forget the breaker of a node (e.g. after it was edited or removed)."""
+    _breakers.pop(address, None)
+
+
+def breaker_states() -> List[dict]:
+    return [breaker.snapshot() for breaker in _breakers.values()]
@@ -0,0 +1,173 @@
+"""Bounded, prioritized fan-out of requests to nodes.
+
+Every async node request takes a slot from the shared executor before it
+is sent. At most NODE_MAX_CONNECTIONS requests are in flight overall and
+NODE_MAX_CONNECTIONS_PER_HOST per node. Waiting requests are admitted by
+priority, so health probes and admin actions are not stuck behind a bulk
+sync. Queue depth and wait times are kept per priority and per node.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+import asyncio
+import heapq
+import itertools
+import time
+
+from backend.config import config
+
+
+# Lower value is admitted first
+PRIORITY_HEALTH = 0
+PRIORITY_USER = 1
+PRIORITY_OUTBOX = 2
+PRIORITY_SYNC = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_HEALTH: "health",
+    PRIORITY_USER: "user",
+    PRIORITY_OUTBOX: "outbox",
+    PRIORITY_SYNC: "sync",
+}
+
+
+class FanoutExecutor:
+    """Admission control with a global and a per-node in-flight cap."""
+
+    def __init__(self, global_limit: int, node_limit: int):
+        self.global_limit = global_limit
+        self.node_limit = node_limit
+        self.in_flight = 0
+        self._node_in_flight: Dict[str, int] = {}
+        # Per-node heaps of (priority, seq, future)
+        self._waiters: Dict[str, List[Tuple[int, int, asyncio.Future]]] = {}
+        self._seq = itertools.count()
+        self._wait_stats: Dict[int, dict] = {
+            priority: {"admitted": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for priority in PRIORITY_NAMES
+        }
+
+    def _has_capacity(self, key: str) -> bool:
+        return (
+            self.in_flight < self.global_limit
+            and self._node_in_flight.get(key, 0) < self.node_limit
+        )
+
+    def _start(self, key: str) -> None:
+        self.in_flight += 1
+        self._node_in_flight[key] = self._node_in_flight.get(key, 0) + 1
+
+    def _release(self, key: str) -> None:
+        self.in_flight -= 1
+        self._node_in_flight[key] -= 1
+        if not self._node_in_flight[key]:
+            del self._node_in_flight[key]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit the best waiters while there is capacity."""
+        while self.in_flight < self.global_limit:
+            best = None
+            for key, heap in list(self._waiters.items()):
+                # Drop waiters that were cancelled while queued
+                while heap and heap[0][2].done():
+                    heapq.heappop(heap)
+                if not heap:
+                    del self._waiters[key]
+                    continue
+                if self._node_in_flight.get(key, 0) >= self.node_limit:
+                    continue
+                if best is None or heap[0] < self._waiters[best][0]:
+                    best = key
+
+            if best is None:
+                return
+
+            _, _, future = heapq.heappop(self._waiters[best])
+            if not self._waiters[best]:
+                del self._waiters[best]
+            self._start(best)
+            future.set_result(None)
+
+    def _record_wait(self, priority: int, waited: float) -> None:
+        stats = self._wait_stats.setdefault(
+            priority, {"admitted": 0, "wait_total": 0.0, "wait_max": 0.0}
+        )
+        stats["admitted"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+
+    @asynccontextmanager
+    async def slot(self, key: str, priority: int = PRIORITY_USER):
+        """Hold one in-flight slot for node ``key`` for the duration of the block."""
+        queued_at = time.monotonic()
+
+        if self._has_capacity(key):
+            self._start(key)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(
+                self._waiters.setdefault(key, []),
+                (priority, next(self._seq), future),
+            )
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Admitted just as we were cancelled, hand the slot back
+                if future.done() and not future.cancelled():
+                    self._release(key)
+                raise
+
+        self._record_wait(priority, time.monotonic() - queued_at)
+        try:
+            yield
+        finally:
+            self._release(key)
+
+    def stats(self) -> dict:
+        """In-flight and queued requests, with wait times per priority."""
+        queued_by_priority = {name: 0 for name in PRIORITY_NAMES.values()}
+        nodes: Dict[str, dict] = {
+            key: {"address": key, "in_flight": count, "queued": 0}
+            for key, count in self._node_in_flight.items()
+        }
+        for key, heap in self._waiters.items():
+            entry = nodes.setdefault(
+                key, {"address": key, "in_flight": 0, "queued": 0}
+            )
+            for priority, _, future in heap:
+                if future.done():
+                    continue
+                entry["queued"] += 1
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                queued_by_priority[name] = queued_by_priority.get(name, 0) + 1
+
+        priorities = {}
+        for priority, stats in self._wait_stats.items():
+            admitted = stats["admitted"]
+            priorities[PRIORITY_NAMES.get(priority, str(priority))] = {
+                "queued": queued_by_priority.get(PRIORITY_NAMES.get(priority), 0),
+                "admitted": admitted,
+                "avg_wait": round(stats["wait_total"] / admitted, 3) if admitted else 0,
+                "max_wait": round(stats["wait_max"], 3),
+            }
+
+        return {
+            "in_flight": self.in_flight,
+            "global_limit": self.global_limit,
+            "node_limit": self.node_limit,
+            "queued": sum(queued_by_priority.values()),
+            "priorities": priorities,
+            "nodes": sorted(
+                nodes.values(),
+                key=lambda node: (node["queued"], node["in_flight"]),
+                reverse=True,
+            ),
+        }
+
+
+# Global executor instance
+fanout = FanoutExecutor(
+    global_limit=config.NODE_MAX_CONNECTIONS,
+    node_limit=config.NODE_MAX_CONNECTIONS_PER_HOST,
+)
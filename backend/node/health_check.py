@@ -1,10 +1,15 @@
 """Health check service for monitoring node status."""
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from backend.db import crud
+from backend.config import config
+from backend.db import async_crud, crud
 from backend.node.requests import NodeRequests
+from backend.node.fanout import PRIORITY_HEALTH
+from backend.node.status_snapshot import status_snapshot
+from backend.node.ranking import node_ranking
 from backend.logger import logger
-from typing import List
+from typing import List, Optional, Tuple
 import asyncio
 from datetime import datetime, timedelta
 
@@ -12,14 +17,15 @@ from datetime import datetime, timedelta
 class HealthCheckService:
     """Service for checking node health and updating status."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def check_node_health(self, node) -> dict:
-        """Check health of a single node with async request.
+    @staticmethod
+    async def measure_node(node) -> Tuple[bool, Optional[float]]:
+        """Send a health probe to a node without touching the database.
         
         Returns:
-            dict with health status information
+            Tuple of (is_healthy, response_time_in_seconds)
         """
         try:
             node_request = NodeRequests(
@@ -28,59 +34,137 @@ class HealthCheckService:
                 api_key=node.key,
                 timeout=3,  # 3 second timeout for health checks
                 max_retries=0,  # No retries for health checks
+                priority=PRIORITY_HEALTH,
             )
             
-            # Use async version
-            is_healthy, response_time = await node_request.check_node_async()
-            
-            # Update consecutive failures
-            if is_healthy:
-                consecutive_failures = 0
-            else:
-                consecutive_failures = node.consecutive_failures + 1
-            
-            # Update node health in database
-            crud.update_node_health(
-                self.db,
-                node.id,
-                is_healthy=is_healthy,
-                response_time=response_time,
-                consecutive_failures=consecutive_failures,
-            )
+            # Same request as the dashboard status, so the probe fills the snapshot
+            live_data = await node_request.get_node_info_async()
+            status_snapshot.record(node.id, live_data)
+            is_healthy = bool(live_data)
+            response_time = live_data.get("response_time") if is_healthy else None
+            node_ranking.observe(node.id, is_healthy, response_time, live_data)
             
             status_msg = "healthy" if is_healthy else "unhealthy"
             time_msg = f"({response_time:.3f}s)" if response_time else "timeout"
             logger.info(f"Health check for node {node.address}: {status_msg} {time_msg}")
             
-            return {
-                "node_id": node.id,
-                "address": node.address,
-                "is_healthy": is_healthy,
-                "response_time": response_time,
-                "consecutive_failures": consecutive_failures,
-            }
+            return is_healthy, response_time
             
         except Exception as e:
             logger.error(f"Error checking health for node {node.address}: {e}")
-            
-            # Mark as unhealthy on exception
+            node_ranking.observe(node.id, False, None)
+            return False, None
+
+    async def check_node_health(self, node) -> dict:
+        """Check health of a single node with async request.
+        
+        Returns:
+            dict with health status information
+        """
+        is_healthy, response_time = await self.measure_node(node)
+        
+        # Update consecutive failures
+        if is_healthy:
+            consecutive_failures = 0
+        else:
             consecutive_failures = node.consecutive_failures + 1
-            crud.update_node_health(
-                self.db,
-                node.id,
-                is_healthy=False,
-                response_time=None,
-                consecutive_failures=consecutive_failures,
+        
+        # Update node health in database
+        await async_crud.update_node_health(
+            self.db,
+            node.id,
+            is_healthy=is_healthy,
+            response_time=response_time,
+            consecutive_failures=consecutive_failures,
+        )
+        
+        return {
+            "node_id": node.id,
+            "address": node.address,
+            "is_healthy": is_healthy,
+            "response_time": response_time,
+            "consecutive_failures": consecutive_failures,
+        }
+
+    @staticmethod
+    def _response_time_moved(old: Optional[float], new: Optional[float]) -> bool:
+        if old is None or new is None:
+            return old != new
+        return abs(new - old) > old * config.HEALTH_RESPONSE_TIME_CHANGE
+
+    async def persist_probe_results(self, results: List[dict]) -> int:
+        """Write a cycle of probe results in a single transaction.
+        
+        Rows are only touched when the node's health changed, its response
+        time moved by more than HEALTH_RESPONSE_TIME_CHANGE, or its last
+        health check is older than HEALTH_PERSIST_INTERVAL. Nodes that come
+        back up are re-activated and marked for sync.
+        
+        Args:
+            results: dicts with node_id, is_healthy and response_time
+                (None for heartbeats)
+            
+        Returns:
+            Number of node rows written
+        """
+        if not results:
+            return 0
+        return await async_crud.write(self._persist_probe_results, results)
+
+    def _persist_probe_results(self, db: Session, results: List[dict]) -> int:
+        nodes = {
+            node.id: node
+            for node in crud.get_nodes_by_ids(
+                db, [result["node_id"] for result in results]
+            )
+        }
+        now = datetime.now()
+        heartbeat = timedelta(seconds=config.HEALTH_PERSIST_INTERVAL)
+        written = 0
+        
+        for result in results:
+            node = nodes.get(result["node_id"])
+            if node is None:
+                continue
+            
+            is_healthy = result["is_healthy"]
+            response_time = result["response_time"]
+            if response_time is None and is_healthy:
+                # Heartbeats report health without a latency
+                response_time = node.response_time
+            was_down = not node.is_healthy or not node.status
+            consecutive_failures = 0 if is_healthy else node.consecutive_failures + 1
+            
+            changed = (
+                node.is_healthy != is_healthy
+                or node.consecutive_failures != consecutive_failures
+                or self._response_time_moved(node.response_time, response_time)
+                or node.last_health_check is None
+                or now - node.last_health_check > heartbeat
             )
             
-            return {
-                "node_id": node.id,
-                "address": node.address,
-                "is_healthy": False,
-                "response_time": None,
-                "consecutive_failures": consecutive_failures,
-                "error": str(e),
-            }
+            if is_healthy and was_down:
+                node.status = True
+                node.sync_status = "pending"  # Need to sync after recovery
+                changed = True
+                logger.info(f"Node {node.address} recovered successfully")
+            elif consecutive_failures >= 3 and node.status:
+                node.status = False
+                changed = True
+            
+            if not changed:
+                continue
+            
+            node.is_healthy = is_healthy
+            node.consecutive_failures = consecutive_failures
+            node.response_time = response_time
+            node.last_health_check = now
+            written += 1
+        
+        if written:
+            db.commit()
+        
+        return written
 
     async def check_all_nodes(self) -> List[dict]:
         """Check health of all nodes.
@@ -88,7 +172,7 @@ class HealthCheckService:
         Returns:
             List of health check results
         """
-        nodes = crud.get_all_nodes(self.db)
+        nodes = await async_crud.get_all_nodes(self.db)
         
         if not nodes:
             logger.info("No nodes found for health check")
@@ -110,6 +194,14 @@ class HealthCheckService:
         
         return valid_results
 
+    @staticmethod
+    def _mark_recovered(db: Session, node_id: int) -> None:
+        node = crud.get_node_by_id(db, node_id)
+        if node:
+            node.status = True
+            node.sync_status = "pending"  # Need to sync after recovery
+            db.commit()
+
     async def auto_recover_nodes(self) -> List[dict]:
         """Attempt to recover nodes that were previously unhealthy.
         
@@ -117,7 +209,7 @@ class HealthCheckService:
             List of nodes that recovered
         """
         # Get nodes that are inactive but might have recovered
-        all_nodes = crud.get_all_nodes(self.db)
+        all_nodes = await async_crud.get_all_nodes(self.db)
         unhealthy_nodes = [n for n in all_nodes if not n.is_healthy or not n.status]
         
         if not unhealthy_nodes:
@@ -130,9 +222,7 @@ class HealthCheckService:
             result = await self.check_node_health(node)
             if result.get("is_healthy"):
                 # Reset consecutive failures and mark as active
-                node.status = True
-                node.sync_status = "pending"  # Need to sync after recovery
-                self.db.commit()
+                await async_crud.write(self._mark_recovered, node.id)
                 
                 recovered_nodes.append(result)
                 logger.info(f"Node {node.address} recovered successfully")
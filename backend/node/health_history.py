@@ -0,0 +1,289 @@
+"""Time series of node probe results for latency percentiles and uptime.
+
+Probe results are aggregated in memory per node and minute, then written
+to node_health_1m once the minute is over. A rollup job folds finished
+hours into node_health_1h and enforces retention of both tables. Every
+bucket keeps a fixed log-scale latency histogram, so percentiles over any
+window are computed by merging histograms instead of reading raw samples.
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.config import config
+from backend.db import crud
+from backend.db.models import NodeHealthHour, NodeHealthMinute
+from backend.logger import logger
+
+
+# Upper bounds of the latency histogram buckets in seconds: 1ms to ~28s,
+# 25% apart, plus a final overflow bucket
+LATENCY_BOUNDS = [0.001 * 1.25**i for i in range(47)]
+
+PERCENTILES = (50, 95, 99)
+
+# Finished hours are rolled up after this delay, when the last minutes of
+# the hour have been flushed by the probes
+ROLLUP_DELAY = timedelta(minutes=5)
+
+
+def _empty_histogram() -> List[int]:
+    return [0] * (len(LATENCY_BOUNDS) + 1)
+
+
+def _floor_minute(at: datetime) -> datetime:
+    return at.replace(second=0, microsecond=0)
+
+
+def _floor_hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(at: datetime) -> datetime:
+    floor = _floor_hour(at)
+    return floor if floor == at else floor + timedelta(hours=1)
+
+
+def percentile(histogram: List[int], q: float) -> Optional[float]:
+    """Upper bound of the histogram bucket holding the q-th percentile."""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = total * q / 100
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            return LATENCY_BOUNDS[min(index, len(LATENCY_BOUNDS) - 1)]
+    return LATENCY_BOUNDS[-1]
+
+
+class HealthHistory:
+    """Per-minute aggregation of probe results and window queries."""
+
+    def __init__(self):
+        # Minute being aggregated per node, and finished minutes to write
+        self._current: Dict[int, dict] = {}
+        self._finished: List[dict] = []
+
+    def record(
+        self,
+        node_id: int,
+        is_healthy: bool,
+        response_time: Optional[float],
+        at: Optional[datetime] = None,
+    ) -> None:
+        """Add one probe result to its node's current minute."""
+        bucket_start = _floor_minute(at or datetime.now())
+        bucket = self._current.get(node_id)
+        if bucket is None or bucket["bucket_start"] != bucket_start:
+            if bucket is not None:
+                self._finished.append(bucket)
+            bucket = {
+                "node_id": node_id,
+                "bucket_start": bucket_start,
+                "probes": 0,
+                "up": 0,
+                "latency_sum": 0.0,
+                "latency_histogram": _empty_histogram(),
+            }
+            self._current[node_id] = bucket
+
+        bucket["probes"] += 1
+        if is_healthy:
+            bucket["up"] += 1
+            if response_time is not None:
+                bucket["latency_sum"] += response_time
+                bucket["latency_histogram"][bisect_left(LATENCY_BOUNDS, response_time)] += 1
+
+    def flush(self, db: Session) -> int:
+        """Write the finished minutes, in one transaction.
+
+        Minutes are finished when a node's next probe falls into a later
+        minute; minutes left open for longer than a minute are closed too.
+
+        Returns:
+            Number of minute buckets written
+        """
+        current_minute = _floor_minute(datetime.now())
+        for node_id, bucket in list(self._current.items()):
+            if bucket["bucket_start"] < current_minute - timedelta(minutes=1):
+                self._finished.append(self._current.pop(node_id))
+
+        if not self._finished:
+            return 0
+
+        buckets, self._finished = self._finished, []
+        crud.add_node_health_buckets(db, NodeHealthMinute, buckets)
+        return len(buckets)
+
+    def forget(self, node_id: int) -> None:
+        self._current.pop(node_id, None)
+        self._finished = [b for b in self._finished if b["node_id"] != node_id]
+
+    def rollup(self, db: Session) -> dict:
+        """Fold finished hours of minute buckets into hour buckets and apply retention.
+
+        Returns:
+            dict with the number of hour buckets written and rows deleted
+        """
+        now = datetime.now()
+        until = _floor_hour(now - ROLLUP_DELAY)
+
+        last_hour = crud.get_last_node_health_bucket_start(db, NodeHealthHour)
+        since = (
+            last_hour + timedelta(hours=1)
+            if last_hour
+            else now - timedelta(days=config.HEALTH_HISTORY_MINUTE_RETENTION)
+        )
+
+        hours: Dict[Tuple[int, datetime], dict] = {}
+        if since < until:
+            for row in crud.get_node_health_buckets(db, NodeHealthMinute, since, until):
+                key = (row.node_id, _floor_hour(row.bucket_start))
+                hour = hours.setdefault(
+                    key,
+                    {
+                        "node_id": row.node_id,
+                        "bucket_start": key[1],
+                        "probes": 0,
+                        "up": 0,
+                        "latency_sum": 0.0,
+                        "latency_histogram": _empty_histogram(),
+                    },
+                )
+                self._add(hour, self._row_bucket(row))
+
+            if hours:
+                crud.add_node_health_buckets(db, NodeHealthHour, list(hours.values()))
+
+        deleted = crud.delete_node_health_buckets_before(
+            db,
+            NodeHealthMinute,
+            now - timedelta(days=config.HEALTH_HISTORY_MINUTE_RETENTION),
+        ) + crud.delete_node_health_buckets_before(
+            db,
+            NodeHealthHour,
+            now - timedelta(days=config.HEALTH_HISTORY_HOUR_RETENTION),
+        )
+
+        if hours or deleted:
+            logger.info(
+                f"Health history rollup: {len(hours)} hour buckets written, "
+                f"{deleted} expired buckets deleted"
+            )
+        return {"hours": len(hours), "deleted": deleted}
+
+    @staticmethod
+    def _add(total: dict, bucket: dict) -> None:
+        total["probes"] += bucket["probes"]
+        total["up"] += bucket["up"]
+        total["latency_sum"] += bucket["latency_sum"]
+        total["latency_histogram"] = [
+            a + b for a, b in zip(total["latency_histogram"], bucket["latency_histogram"])
+        ]
+
+    @staticmethod
+    def _row_bucket(row) -> dict:
+        return {
+            "probes": row.probes,
+            "up": row.up,
+            "latency_sum": row.latency_sum,
+            "latency_histogram": row.latency_histogram,
+        }
+
+    def query(
+        self,
+        db: Session,
+        start: datetime,
+        end: datetime,
+        node_id: Optional[int] = None,
+    ) -> List[dict]:
+        """Latency percentiles and uptime per node over [start, end).
+
+        Whole hours that were already rolled up are read from hour buckets,
+        the edges of the window from minute buckets. Minute resolution only
+        reaches back HEALTH_HISTORY_MINUTE_RETENTION days, so older edges are
+        rounded to whole hours.
+
+        Returns:
+            List of per-node stats
+        """
+        last_hour = crud.get_last_node_health_bucket_start(db, NodeHealthHour)
+        rolled_until = last_hour + timedelta(hours=1) if last_hour else None
+
+        ranges: List[Tuple[type, datetime, datetime]] = []
+        hours_from = _ceil_hour(start)
+        hours_to = min(_floor_hour(end), rolled_until) if rolled_until else hours_from
+        minutes_kept = datetime.now() - timedelta(
+            days=config.HEALTH_HISTORY_MINUTE_RETENTION
+        )
+
+        if hours_from < hours_to:
+            if start < minutes_kept:
+                hours_from = _floor_hour(start)
+            else:
+                ranges.append((NodeHealthMinute, start, hours_from))
+            ranges.append((NodeHealthHour, hours_from, hours_to))
+            ranges.append((NodeHealthMinute, hours_to, end))
+        else:
+            ranges.append((NodeHealthMinute, start, end))
+
+        totals: Dict[int, dict] = {}
+
+        def total_for(node: int) -> dict:
+            return totals.setdefault(
+                node,
+                {
+                    "probes": 0,
+                    "up": 0,
+                    "latency_sum": 0.0,
+                    "latency_histogram": _empty_histogram(),
+                },
+            )
+
+        for model, range_start, range_end in ranges:
+            if range_start >= range_end:
+                continue
+            for row in crud.get_node_health_buckets(
+                db, model, range_start, range_end, node_id
+            ):
+                self._add(total_for(row.node_id), self._row_bucket(row))
+
+        # Minutes not written yet
+        for bucket in self._finished + list(self._current.values()):
+            if node_id is not None and bucket["node_id"] != node_id:
+                continue
+            if start <= bucket["bucket_start"] < end:
+                self._add(total_for(bucket["node_id"]), bucket)
+
+        results = []
+        for node, total in sorted(totals.items()):
+            up, probes = total["up"], total["probes"]
+            samples = sum(total["latency_histogram"])
+            results.append(
+                {
+                    "node_id": node,
+                    "probes": probes,
+                    "uptime": round(up / probes, 4) if probes else None,
+                    "latency_avg": round(total["latency_sum"] / samples, 4)
+                    if samples
+                    else None,
+                    **{
+                        f"latency_p{q}": (
+                            round(percentile(total["latency_histogram"], q), 4)
+                            if samples
+                            else None
+                        )
+                        for q in PERCENTILES
+                    },
+                }
+            )
+        return results
+
+
+# Global history instance
+health_history = HealthHistory()
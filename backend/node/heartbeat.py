@@ -0,0 +1,97 @@
+"""Status heartbeats pushed by nodes.
+
+Nodes post their status (CPU, memory, connected clients and a digest of
+their user set) on their own schedule. A heartbeat counts as a healthy
+probe: it refreshes the status snapshot and the download ranking, goes
+through the same batched persistence as probes, and holds off active
+probing of the node until heartbeats are HEARTBEAT_STALE_AFTER seconds old.
+
+When the reported user digest differs from the users the panel placed on
+the node, the node is marked "drifted" and gets a full reconcile from the
+pending sync job.
+"""
+
+from typing import Dict, Iterable, Optional
+import hashlib
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import config
+from backend.db import async_crud
+from backend.logger import logger
+from backend.node.ranking import node_ranking
+from backend.node.scheduler import scheduler
+from backend.node.status_snapshot import status_snapshot
+from backend.schema._input import NodeHeartbeat
+
+
+def users_digest(user_names: Iterable[str]) -> str:
+    """sha256 hex of user names, sorted and joined by newlines."""
+    return hashlib.sha256("\n".join(sorted(user_names)).encode()).hexdigest()
+
+
+class NodeHeartbeats:
+    """Ingests heartbeats and checks the user digests they carry."""
+
+    def __init__(self):
+        # Last user digest checked per node, only changed digests are checked
+        self._digests: Dict[int, str] = {}
+
+    async def ingest(self, db: AsyncSession, node, heartbeat: NodeHeartbeat) -> dict:
+        """Record a heartbeat of ``node`` in the in-memory node state.
+
+        Returns:
+            dict with the heartbeat deadline and whether the users drifted
+        """
+        live_data = heartbeat.model_dump(
+            exclude={"address", "users_digest"}, exclude_none=True
+        )
+        # Keep the latency measured by the last probe for the dashboard
+        previous = status_snapshot.get(node.id) or {}
+        if previous.get("response_time") is not None:
+            live_data["response_time"] = previous["response_time"]
+
+        status_snapshot.record(node.id, live_data)
+        node_ranking.observe(node.id, True, None, live_data)
+        scheduler.probes.record_heartbeat(node.id)
+
+        drifted = False
+        digest = heartbeat.users_digest
+        if digest and digest != self._digests.get(node.id):
+            checked = await self._check_users(db, node, digest)
+            if checked is not None:
+                self._digests[node.id] = digest
+                drifted = not checked
+
+        return {"stale_after": config.HEARTBEAT_STALE_AFTER, "users_drifted": drifted}
+
+    async def _check_users(self, db: AsyncSession, node, digest: str) -> Optional[bool]:
+        """Compare a node's user digest with its placements.
+
+        Returns:
+            True if they match, False if the node drifted, None when the
+            node is still converging and cannot be compared yet
+        """
+        if node.sync_status != "synced":
+            return None
+
+        placements = await async_crud.get_node_users(db, node.id)
+        if any(row.state != "present" for row in placements):
+            return None
+
+        expected = users_digest(f"{row.user_name}-{node.name}" for row in placements)
+        if expected == digest:
+            return True
+
+        logger.warning(
+            f"Users on node {node.address} drifted from the panel, scheduling a full sync"
+        )
+        await async_crud.update_node_sync_status(db, node.id, "drifted")
+        return False
+
+    def forget(self, node_id: int) -> None:
+        self._digests.pop(node_id, None)
+
+
+# Global heartbeat instance
+node_heartbeats = NodeHeartbeats()
@@ -0,0 +1,296 @@
+"""Durable outbox of user operations for nodes.
+
+User create/delete requests enqueue one operation per node and return.
+The background scheduler drains the queue with per-node concurrency
+limits, exponential backoff and dead-lettering.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from backend.config import config
+from backend.db import async_crud, crud
+from backend.node.requests import NodeRequests
+from backend.node.fanout import PRIORITY_OUTBOX
+from backend.logger import logger
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import random
+
+
+# Operations the outbox still runs; their placements are left to it
+LIVE_OPERATION_STATES = ["queued", "running"]
+
+
+class OutboxService:
+    """Service for queueing and executing node operations."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def enqueue_user_operation(self, user_name: str, operation: str) -> list:
+        """Queue a create or delete of a user on every node.
+
+        Returns:
+            List of queued operations
+        """
+        return await async_crud.write(self._enqueue, user_name, operation)
+
+    @staticmethod
+    def _enqueue(db: Session, user_name: str, operation: str) -> list:
+        user = crud.get_user_by_name(db, user_name)
+        placement = [(user.id, user.name)] if user else []
+        nodes = crud.get_all_nodes(db)
+
+        operations = []
+        for node in nodes:
+            if operation == "delete":
+                # A create that never ran has nothing to undo on the node, a
+                # dead-lettered one must not be retried after the delete
+                row = crud.get_node_user(db, node.id, user.id) if user else None
+                cancelled = crud.cancel_node_operations(
+                    db, node.id, user_name, "create"
+                )
+                if cancelled and row and row.state == "pending":
+                    crud.delete_node_users(db, node.id, [user.id])
+                    continue
+                crud.set_node_users_state(db, node.id, placement, "deleting")
+            else:
+                crud.set_node_users_state(db, node.id, placement, "pending")
+
+            operations.append(
+                {
+                    "node_id": node.id,
+                    "user_id": user.id if user else None,
+                    "user_name": user_name,
+                    "operation": operation,
+                }
+            )
+
+        rows = crud.enqueue_node_operations(db, operations)
+        logger.info(
+            f"Queued {operation} of user '{user_name}' on {len(operations)} nodes"
+        )
+        return rows
+
+    @staticmethod
+    def backoff(attempts: int) -> float:
+        """Delay before the next attempt, exponential with jitter."""
+        delay = min(
+            config.OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1)),
+            config.OUTBOX_BACKOFF_MAX,
+        )
+        return delay * random.uniform(0.8, 1.2)
+
+    async def _execute(
+        self, operation, node, limit: asyncio.Semaphore
+    ) -> Tuple[object, bool]:
+        """Run a single operation against its node."""
+        async with limit:
+            node_request = NodeRequests(
+                address=node.address,
+                port=node.port,
+                api_key=node.key,
+                timeout=10,
+                max_retries=0,
+                priority=PRIORITY_OUTBOX,
+            )
+            name = f"{operation.user_name}-{node.name}"
+            try:
+                if operation.operation == "create":
+                    success = await node_request.create_user_async(name)
+                else:
+                    success = await node_request.delete_user_async(name)
+            except Exception as e:
+                logger.error(f"Error running outbox operation {operation.id}: {e}")
+                success = False
+            return operation, success
+
+    async def drain(self) -> dict:
+        """Claim due operations and run them.
+
+        Returns:
+            dict with counts of done, retried and dead-lettered operations
+        """
+        operations = await async_crud.claim_node_operations(
+            self.db, config.OUTBOX_BATCH_SIZE
+        )
+        if not operations:
+            return {"done": 0, "retried": 0, "dead": 0}
+
+        nodes = {node.id: node for node in await async_crud.get_all_nodes(self.db)}
+        limits: Dict[int, asyncio.Semaphore] = {}
+
+        tasks = []
+        for operation in operations:
+            node = nodes[operation.node_id]
+            limit = limits.setdefault(
+                node.id, asyncio.Semaphore(config.OUTBOX_NODE_CONCURRENCY)
+            )
+            tasks.append(self._execute(operation, node, limit))
+
+        results = await asyncio.gather(*tasks)
+        counts = await async_crud.write(self._record_results, results)
+
+        logger.info(
+            f"Outbox drained: {counts['done']} done, {counts['retried']} retried, "
+            f"{counts['dead']} dead-lettered"
+        )
+        return counts
+
+    async def run_now(
+        self, operations: list, deadline: float
+    ) -> Tuple[List[Tuple[object, bool]], list]:
+        """Run just-queued operations inline instead of waiting for a drain.
+
+        Operations of healthy, active nodes are sent concurrently. Whatever
+        has not finished by the deadline is cancelled and left queued for the
+        background drain, as are operations of unavailable nodes.
+
+        Returns:
+            Tuple of (finished (operation, success) pairs, operations left queued)
+        """
+        nodes = {node.id: node for node in await async_crud.get_healthy_nodes(self.db)}
+        runnable = [operation for operation in operations if operation.node_id in nodes]
+        left = [operation for operation in operations if operation.node_id not in nodes]
+        if not runnable:
+            return [], left
+
+        await async_crud.set_node_operations_state(
+            self.db, [operation.id for operation in runnable], "running"
+        )
+
+        limits: Dict[int, asyncio.Semaphore] = {}
+        tasks = {}
+        for operation in runnable:
+            limit = limits.setdefault(
+                operation.node_id, asyncio.Semaphore(config.OUTBOX_NODE_CONCURRENCY)
+            )
+            task = asyncio.create_task(
+                self._execute(operation, nodes[operation.node_id], limit)
+            )
+            tasks[task] = operation
+
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        for task in pending:
+            operation = tasks[task]
+            operation.state = "queued"
+            left.append(operation)
+
+        results = [task.result() for task in done]
+        await async_crud.write(self._record_results, results)
+        return results, left
+
+    def _record_results(self, db: Session, results: List[Tuple[object, bool]]) -> dict:
+        """Finish executed operations: delete done ones, back off or dead-letter failed ones.
+
+        Returns:
+            dict with counts of done, retried and dead-lettered operations
+        """
+        now = datetime.now()
+        done, retried, dead = 0, 0, 0
+        for operation, success in results:
+            # Loaded by another session, continue with this one's copy
+            operation = db.merge(operation)
+            placement = []
+            if operation.user_id is not None:
+                placement = [(operation.user_id, operation.user_name)]
+
+            if success:
+                if operation.operation == "create":
+                    crud.set_node_users_state(
+                        db, operation.node_id, placement, "present"
+                    )
+                else:
+                    crud.delete_node_users(
+                        db, operation.node_id, [uid for uid, _ in placement]
+                    )
+                db.delete(operation)
+                done += 1
+                continue
+
+            operation.attempts += 1
+            operation.last_error = f"{operation.operation} failed on node"
+            if operation.attempts >= config.OUTBOX_MAX_ATTEMPTS:
+                operation.state = "dead"
+                dead += 1
+                logger.error(
+                    f"Outbox operation {operation.id} ({operation.operation} "
+                    f"'{operation.user_name}' on node {operation.node_id}) "
+                    f"dead-lettered after {operation.attempts} attempts"
+                )
+            else:
+                operation.state = "queued"
+                operation.next_attempt_at = now + timedelta(
+                    seconds=self.backoff(operation.attempts)
+                )
+                retried += 1
+
+            crud.set_node_users_state(
+                db,
+                operation.node_id,
+                placement,
+                "failed" if operation.operation == "create" else "deleting",
+                error=operation.last_error,
+                count_attempt=True,
+            )
+
+        db.commit()
+        return {"done": done, "retried": retried, "dead": dead}
+
+    async def stats(self) -> dict:
+        """Queue depth and lag, overall and per node."""
+        now = datetime.now()
+        nodes = {node.id: node for node in await async_crud.get_all_nodes(self.db)}
+
+        depth = {"queued": 0, "running": 0, "dead": 0}
+        oldest: Optional[datetime] = None
+        per_node: Dict[int, dict] = {}
+
+        rows = await async_crud.get_node_operation_stats(self.db)
+        for node_id, state, count, created_at in rows:
+            depth[state] = depth.get(state, 0) + count
+            node = nodes.get(node_id)
+            entry = per_node.setdefault(
+                node_id,
+                {
+                    "node_id": node_id,
+                    "address": node.address if node else None,
+                    "queued": 0,
+                    "running": 0,
+                    "dead": 0,
+                    "lag_seconds": 0,
+                },
+            )
+            entry[state] = count
+            if state != "dead":
+                lag = (now - created_at).total_seconds()
+                entry["lag_seconds"] = max(entry["lag_seconds"], round(lag, 1))
+                if oldest is None or created_at < oldest:
+                    oldest = created_at
+
+        return {
+            "depth": depth,
+            "lag_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0,
+            "nodes": list(per_node.values()),
+        }
+
+    async def dead_letters(self, limit: int = 100) -> List[dict]:
+        """Most recent dead-lettered operations."""
+        return [
+            {
+                "id": operation.id,
+                "node_id": operation.node_id,
+                "user": operation.user_name,
+                "operation": operation.operation,
+                "attempts": operation.attempts,
+                "last_error": operation.last_error,
+                "created_at": str(operation.created_at),
+            }
+            for operation in await async_crud.get_dead_node_operations(self.db, limit)
+        ]
@@ -0,0 +1,193 @@
+"""Adaptive per-node health probe scheduler.
+
+Replaces the fixed sweep of every node every 10 seconds. Each node has its
+own probe interval:
+
+- nodes whose health keeps the same value back off towards
+  HEALTH_MAX_INTERVAL
+- nodes that flip between healthy and unhealthy are probed every
+  HEALTH_MIN_INTERVAL
+- everything else uses HEALTH_CHECK_INTERVAL
+
+Start times are jittered across the interval so probes are spread out
+instead of bursting, every probe also handles recovery (one probe per node
+per cycle), and at most HEALTH_MAX_IN_FLIGHT probes run at once.
+
+Probes never write to the database themselves: their results are buffered
+and persisted once per tick in a single transaction, skipping nodes whose
+health did not change.
+
+Nodes that push heartbeats are not probed at all while the heartbeats keep
+coming; a node is probed again HEARTBEAT_STALE_AFTER seconds after its last
+heartbeat.
+"""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+import asyncio
+import random
+import time
+
+from backend.config import config
+from backend.db import async_crud
+from backend.db.engine import asyncSessionLocal
+from backend.logger import logger
+from backend.node.health_check import HealthCheckService
+from backend.node.health_history import health_history
+from backend.node.ranking import node_ranking
+
+
+# Health flips within this window make a node count as flapping
+FLAP_WINDOW = 300
+FLAP_TRANSITIONS = 2
+
+
+class NodeProbeState:
+    """Probe schedule of a single node."""
+
+    def __init__(self, node_id: int, first_probe_at: float):
+        self.node_id = node_id
+        self.next_probe_at = first_probe_at
+        self.interval = float(config.HEALTH_CHECK_INTERVAL)
+        self.last_healthy: Optional[bool] = None
+        self.stable_probes = 0
+        self.transitions: Deque[float] = deque(maxlen=FLAP_TRANSITIONS)
+        self.heartbeat_at: Optional[float] = None
+
+    def is_flapping(self, now: float) -> bool:
+        return (
+            len(self.transitions) == FLAP_TRANSITIONS
+            and now - self.transitions[0] < FLAP_WINDOW
+        )
+
+    def record(self, is_healthy: bool, now: float) -> None:
+        """Update the schedule after a probe finished."""
+        if self.last_healthy is not None and is_healthy != self.last_healthy:
+            self.transitions.append(now)
+            self.stable_probes = 0
+        else:
+            self.stable_probes += 1
+        self.last_healthy = is_healthy
+
+        if self.is_flapping(now):
+            self.interval = float(config.HEALTH_MIN_INTERVAL)
+        elif self.stable_probes >= config.HEALTH_STABLE_PROBES:
+            self.interval = min(self.interval * 1.5, config.HEALTH_MAX_INTERVAL)
+        else:
+            self.interval = float(config.HEALTH_CHECK_INTERVAL)
+
+        self.next_probe_at = now + self.interval * random.uniform(0.9, 1.1)
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "node_id": self.node_id,
+            "interval": round(self.interval, 1),
+            "next_probe_in": round(max(self.next_probe_at - now, 0), 1),
+            "last_healthy": self.last_healthy,
+            "stable_probes": self.stable_probes,
+            "flapping": self.is_flapping(now),
+            "heartbeat_age": (
+                round(now - self.heartbeat_at, 1) if self.heartbeat_at is not None else None
+            ),
+        }
+
+
+class ProbeScheduler:
+    """Runs per-node health probes when they are due."""
+
+    def __init__(self):
+        self.states: Dict[int, NodeProbeState] = {}
+        self.in_flight: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._results: List[dict] = []
+
+    async def _probe(self, node) -> None:
+        is_healthy, response_time = False, None
+        try:
+            is_healthy, response_time = await HealthCheckService.measure_node(node)
+        except Exception as e:
+            logger.error(f"Error probing node {node.id}: {e}")
+        finally:
+            self._results.append(
+                {
+                    "node_id": node.id,
+                    "is_healthy": is_healthy,
+                    "response_time": response_time,
+                }
+            )
+            state = self.states.get(node.id)
+            if state is not None:
+                state.record(is_healthy, time.monotonic())
+            self.in_flight.discard(node.id)
+
+    def record_heartbeat(self, node_id: int) -> None:
+        """Count a node heartbeat as a healthy probe and hold off active probes."""
+        now = time.monotonic()
+        # Heartbeats carry no latency, the stored response time is kept
+        self._results.append(
+            {"node_id": node_id, "is_healthy": True, "response_time": None}
+        )
+        state = self.states.get(node_id)
+        if state is None:
+            state = self.states[node_id] = NodeProbeState(node_id, now)
+        state.record(True, now)
+        state.heartbeat_at = now
+        state.next_probe_at = max(
+            state.next_probe_at, now + config.HEARTBEAT_STALE_AFTER
+        )
+
+    async def flush(self, db) -> int:
+        """Persist the buffered probe results in one transaction."""
+        results, self._results = self._results, []
+        for result in results:
+            health_history.record(
+                result["node_id"], result["is_healthy"], result["response_time"]
+            )
+        await async_crud.write(health_history.flush)
+        if results:
+            node_ranking.recompute()
+        return await HealthCheckService(db).persist_probe_results(results)
+
+    async def tick(self) -> int:
+        """Persist finished probes and start the ones that are due.
+
+        Returns:
+            Number of probes started
+        """
+        now = time.monotonic()
+
+        async with asyncSessionLocal() as db:
+            await self.flush(db)
+            nodes = {node.id: node for node in await async_crud.get_all_nodes(db)}
+        node_ids = list(nodes)
+
+        # Track new nodes with a jittered first probe, forget removed ones
+        for node_id in node_ids:
+            if node_id not in self.states:
+                self.states[node_id] = NodeProbeState(
+                    node_id, now + random.uniform(0, config.HEALTH_CHECK_INTERVAL)
+                )
+        for node_id in set(self.states) - set(node_ids):
+            del self.states[node_id]
+
+        due = sorted(
+            (
+                state
+                for state in self.states.values()
+                if state.next_probe_at <= now and state.node_id not in self.in_flight
+            ),
+            key=lambda state: state.next_probe_at,
+        )
+        capacity = max(config.HEALTH_MAX_IN_FLIGHT - len(self.in_flight), 0)
+
+        for state in due[:capacity]:
+            self.in_flight.add(state.node_id)
+            task = asyncio.create_task(self._probe(nodes[state.node_id]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return min(len(due), capacity)
+
+    def get_states(self) -> List[dict]:
+        now = time.monotonic()
+        return [state.snapshot(now) for state in self.states.values()]
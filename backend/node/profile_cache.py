@@ -0,0 +1,202 @@
+"""Bounded cache of OVPN profiles downloaded from nodes.
+
+Entries are keyed by (node id, user name) and hold the profile bytes with
+their content hash, which is used as the ETag. The memory tier is an LRU
+bounded by total bytes; an optional disk tier under data/ovpn-cache keeps
+evicted profiles around across restarts.
+
+Every invalidation bumps a generation counter. A download records the
+generation when it starts and passes it to put, so a profile invalidated
+while it was being downloaded (its user deleted, say) is not cached again.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+from urllib.parse import quote
+import hashlib
+import os
+import time
+
+from backend.config import config
+from backend.logger import logger
+
+
+class CachedProfile(NamedTuple):
+    content: bytes
+    content_hash: str
+    stored_at: float
+
+    @classmethod
+    def of(cls, content: bytes, stored_at: Optional[float] = None) -> "CachedProfile":
+        return cls(content, hashlib.sha256(content).hexdigest(), stored_at or time.time())
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.content_hash}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches an ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ProfileCache:
+    """LRU cache of OVPN profiles bounded by bytes, with optional disk tier."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entry_bytes: int,
+        ttl: int,
+        disk_dir: Optional[Path] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[Tuple[int, str], CachedProfile]" = OrderedDict()
+        self._size = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, node_id: int, user: str) -> Path:
+        return self.disk_dir / str(node_id) / f"{quote(user, safe='')}.ovpn"
+
+    def _expired(self, entry: CachedProfile) -> bool:
+        return time.time() - entry.stored_at > self.ttl
+
+    def _drop(self, key: Tuple[int, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.content)
+
+    def _store(self, key: Tuple[int, str], entry: CachedProfile) -> None:
+        self._drop(key)
+        self._entries[key] = entry
+        self._size += len(entry.content)
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.content)
+
+    def _load_from_disk(self, node_id: int, user: str) -> Optional[CachedProfile]:
+        path = self._disk_path(node_id, user)
+        try:
+            stored_at = path.stat().st_mtime
+            content = path.read_bytes()
+        except OSError:
+            return None
+        return CachedProfile.of(content, stored_at)
+
+    def get(self, node_id: int, user: str) -> Optional[CachedProfile]:
+        """Return a fresh cached profile, promoting disk hits to memory."""
+        key = (node_id, user)
+        entry = self._entries.get(key)
+
+        if entry is None and self.disk_dir is not None:
+            entry = self._load_from_disk(node_id, user)
+            if entry is not None and not self._expired(entry):
+                self._store(key, entry)
+
+        if entry is None or self._expired(entry):
+            self._forget(node_id, user)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(
+        self, node_id: int, user: str, content: bytes, generation: Optional[int] = None
+    ) -> Optional[CachedProfile]:
+        """Cache a profile; profiles above max_entry_bytes are not cached.
+
+        With a generation, the profile is not cached either if anything was
+        invalidated since that generation was read.
+        """
+        if len(content) > self.max_entry_bytes:
+            return None
+        if generation is not None and generation != self.generation:
+            return None
+
+        entry = CachedProfile.of(content)
+        self._store((node_id, user), entry)
+
+        if self.disk_dir is not None:
+            path = self._disk_path(node_id, user)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Failed to write cached profile {path}: {e}")
+
+        return entry
+
+    def _forget(self, node_id: int, user: str) -> None:
+        self._drop((node_id, user))
+        if self.disk_dir is not None:
+            self._disk_path(node_id, user).unlink(missing_ok=True)
+
+    def invalidate(self, node_id: int, user: str) -> None:
+        self.generation += 1
+        self._forget(node_id, user)
+
+    def invalidate_user(self, user: str) -> None:
+        """Drop a user's profiles on every node."""
+        self.generation += 1
+        for key in [key for key in self._entries if key[1] == user]:
+            self._drop(key)
+        if self.disk_dir is not None and self.disk_dir.exists():
+            for node_dir in self.disk_dir.iterdir():
+                (node_dir / f"{quote(user, safe='')}.ovpn").unlink(missing_ok=True)
+
+    def invalidate_node(self, node_id: int) -> None:
+        """Drop every profile downloaded from a node."""
+        self.generation += 1
+        for key in [key for key in self._entries if key[0] == node_id]:
+            self._drop(key)
+        if self.disk_dir is not None:
+            for path in (self.disk_dir / str(node_id)).glob("*.ovpn"):
+                path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._size = 0
+        if self.disk_dir is not None and self.disk_dir.exists():
+            for path in self.disk_dir.glob("*/*.ovpn"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Global cache instance
+profile_cache = ProfileCache(
+    max_bytes=config.OVPN_CACHE_MAX_BYTES,
+    max_entry_bytes=config.OVPN_CACHE_MAX_ENTRY_BYTES,
+    ttl=config.OVPN_CACHE_TTL,
+    disk_dir=(
+        BASE_DIR.parent.parent / "data" / "ovpn-cache"
+        if config.OVPN_CACHE_DISK
+        else None
+    ),
+)
@@ -0,0 +1,164 @@
+"""Ranking of nodes for OVPN downloads.
+
+Every health probe feeds the node's EWMA latency, CPU and memory usage,
+connected clients (when the node reports them) and a decaying failure
+score. The weights are recomputed once per probe tick and kept in memory.
+Downloads try nodes in weighted random order, so load spreads over all
+good nodes instead of following the single fastest probe.
+"""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import random
+import time
+
+from backend.config import config
+
+
+# Failures count half as much after this many seconds
+FAILURE_HALF_LIFE = 300.0
+
+# Recent download latencies kept per node, and how many are needed before
+# their p95 is trusted as the hedging delay
+DOWNLOAD_SAMPLES = 100
+MIN_DOWNLOAD_SAMPLES = 10
+
+
+class NodeStats:
+    """Smoothed health signals of a single node."""
+
+    def __init__(self, node_id: int):
+        self.node_id = node_id
+        self.latency: Optional[float] = None  # EWMA, in seconds
+        self.cpu: Optional[float] = None  # percent
+        self.memory: Optional[float] = None  # percent
+        self.clients: Optional[int] = None
+        self.failures = 0.0
+        self.updated_at = time.monotonic()
+        self.downloads: Deque[float] = deque(maxlen=DOWNLOAD_SAMPLES)
+
+    def observe(self, is_healthy: bool, response_time: Optional[float], live_data: dict):
+        now = time.monotonic()
+        self.failures *= 0.5 ** ((now - self.updated_at) / FAILURE_HALF_LIFE)
+        self.updated_at = now
+
+        if not is_healthy:
+            self.failures += 1
+            return
+
+        if response_time is not None:
+            alpha = config.NODE_RANK_EWMA_ALPHA
+            self.latency = (
+                response_time
+                if self.latency is None
+                else alpha * response_time + (1 - alpha) * self.latency
+            )
+        self.cpu = live_data.get("cpu_usage", self.cpu)
+        self.memory = live_data.get("memory_usage", self.memory)
+        clients = live_data.get("clients", live_data.get("connected_clients"))
+        if isinstance(clients, list):
+            clients = len(clients)
+        if clients is not None:
+            self.clients = clients
+
+    def cost(self, max_clients: int) -> float:
+        """Lower is better; 0 for an idle node with no latency or failures."""
+        cost = config.NODE_RANK_FAILURE_WEIGHT * self.failures
+        if self.latency is not None:
+            cost += self.latency / config.NODE_RANK_LATENCY_REF
+        if self.cpu is not None:
+            cost += config.NODE_RANK_CPU_WEIGHT * self.cpu / 100
+        if self.memory is not None:
+            cost += config.NODE_RANK_MEMORY_WEIGHT * self.memory / 100
+        if self.clients is not None and max_clients:
+            cost += config.NODE_RANK_CLIENT_WEIGHT * self.clients / max_clients
+        return cost
+
+
+class NodeRanking:
+    """Download weights of all nodes, recomputed each probe tick."""
+
+    def __init__(self):
+        self._stats: Dict[int, NodeStats] = {}
+        self.weights: Dict[int, float] = {}
+
+    def observe(
+        self,
+        node_id: int,
+        is_healthy: bool,
+        response_time: Optional[float],
+        live_data: Optional[dict] = None,
+    ) -> None:
+        stats = self._stats.get(node_id)
+        if stats is None:
+            stats = self._stats[node_id] = NodeStats(node_id)
+        stats.observe(is_healthy, response_time, live_data or {})
+
+    def observe_download(self, node_id: int, seconds: float) -> None:
+        """Record how long a node took to start answering a download."""
+        stats = self._stats.get(node_id)
+        if stats is None:
+            stats = self._stats[node_id] = NodeStats(node_id)
+        stats.downloads.append(seconds)
+
+    def hedge_delay(self, node_id: int) -> float:
+        """p95 download latency of a node, DOWNLOAD_HEDGE_DELAY until known."""
+        stats = self._stats.get(node_id)
+        if stats is None or len(stats.downloads) < MIN_DOWNLOAD_SAMPLES:
+            return config.DOWNLOAD_HEDGE_DELAY
+        samples = sorted(stats.downloads)
+        return samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+
+    def forget(self, node_id: int) -> None:
+        self._stats.pop(node_id, None)
+        self.weights.pop(node_id, None)
+
+    def recompute(self) -> None:
+        max_clients = max(
+            (stats.clients or 0 for stats in self._stats.values()), default=0
+        )
+        self.weights = {
+            node_id: 1 / (1 + stats.cost(max_clients))
+            for node_id, stats in self._stats.items()
+        }
+
+    def order(self, nodes: list) -> list:
+        """The given nodes in weighted random order, for failover.
+
+        Better-ranked nodes tend to come first, but every node can lead; the
+        first node is a weighted random choice. Nodes not probed yet get
+        the median weight of the known ones.
+        """
+        known = sorted(self.weights[node.id] for node in nodes if node.id in self.weights)
+        default = known[len(known) // 2] if known else 1.0
+        # Weighted sampling without replacement (Efraimidis-Spirakis keys)
+        return sorted(
+            nodes,
+            key=lambda node: random.random() ** (1 / self.weights.get(node.id, default)),
+            reverse=True,
+        )
+
+    def snapshot(self) -> List[dict]:
+        total = sum(self.weights.values())
+        return sorted(
+            (
+                {
+                    "node_id": node_id,
+                    "weight": round(weight, 4),
+                    "share": round(weight / total, 4) if total else None,
+                    "latency_ewma": round(stats.latency, 4) if stats.latency else None,
+                    "cpu_usage": stats.cpu,
+                    "memory_usage": stats.memory,
+                    "clients": stats.clients,
+                    "failures": round(stats.failures, 2),
+                }
+                for node_id, weight in self.weights.items()
+                if (stats := self._stats.get(node_id)) is not None
+            ),
+            key=lambda entry: entry["weight"],
+            reverse=True,
+        )
+
+
+# Global ranking instance
+node_ranking = NodeRanking()
@@ -1,15 +1,72 @@
 import requests
-from fastapi.responses import Response
+import httpx
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from backend.config import config
 from backend.logger import logger
+from backend.metrics import NODE_REQUEST_ERRORS, NODE_REQUEST_SECONDS
+from backend.node.circuit_breaker import get_breaker
+from backend.node.fanout import PRIORITY_USER, fanout
 import time
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from functools import partial
+import ssl
 
 
-# Thread pool for async operations
-_executor = ThreadPoolExecutor(max_workers=10)
+# Building an SSL context is expensive, share one across all node clients
+_ssl_context = ssl.create_default_context()
+
+# Pooled keep-alive clients, one per node address ("host:port")
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+# Feature advertised by node agents that accept batched user operations
+BATCH_FEATURE = "batch-users"
+
+# Whether each node address advertises BATCH_FEATURE, learned from get-status
+_batch_support: Dict[str, bool] = {}
+
+
+def _operation(url: str) -> str:
+    """Metrics label of a node API url: its path without per-user parts."""
+    return "/" + "/".join(url.split("/")[3:6])
+
+
+def _record_features(address: str, node_data: dict) -> None:
+    """Remember the features a node advertised in its get-status payload."""
+    features = node_data.get("features") or []
+    _batch_support[address] = BATCH_FEATURE in features
+
+
+def get_client(address: str) -> httpx.AsyncClient:
+    """Return the pooled async client for a node, creating it on first use."""
+    client = _clients.get(address)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            verify=_ssl_context,
+            limits=httpx.Limits(
+                max_connections=config.NODE_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=config.NODE_MAX_CONNECTIONS_PER_HOST,
+                keepalive_expiry=config.NODE_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _clients[address] = client
+    return client
+
+
+async def close_client(address: str) -> None:
+    """Close and drop the pooled client of a single node."""
+    client = _clients.pop(address, None)
+    if client is not None:
+        await client.aclose()
+
+
+async def close_clients() -> None:
+    """Close all pooled node clients (called on shutdown)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(
+        *[client.aclose() for client in clients], return_exceptions=True
+    )
 
 
 class NodeRequests:
@@ -26,6 +83,7 @@ class NodeRequests:
         set_new_setting: bool = False,
         timeout: int = 5,  # Reduced to 5 seconds
         max_retries: int = 1,  # Reduced to 1 retry
+        priority: int = PRIORITY_USER,  # fan-out admission priority
     ):
         self.address = f"{address}:{port}"
         self.headers = {"key": api_key}
@@ -35,6 +93,7 @@ class NodeRequests:
         self.set_new_setting = set_new_setting
         self.timeout = timeout
         self.max_retries = max_retries
+        self.priority = priority
 
     def _make_request(
         self, method: str, url: str, **kwargs
@@ -78,11 +137,61 @@ class NodeRequests:
     
     async def _make_request_async(
         self, method: str, url: str, **kwargs
-    ) -> Tuple[Optional[requests.Response], Optional[float]]:
-        """Async wrapper for _make_request using thread pool."""
-        loop = asyncio.get_event_loop()
-        func = partial(self._make_request, method, url, **kwargs)
-        return await loop.run_in_executor(_executor, func)
+    ) -> Tuple[Optional[httpx.Response], Optional[float]]:
+        """Make HTTP request over the node's pooled keep-alive connections.
+        
+        Returns:
+            Tuple of (response, response_time_in_seconds)
+        """
+        if "timeout" not in kwargs:
+            kwargs["timeout"] = self.timeout
+        
+        client = get_client(self.address)
+        breaker = get_breaker(self.address)
+        
+        # Fail fast while the node's circuit is open
+        if not breaker.allow_request():
+            return None, None
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with fanout.slot(self.address, self.priority):
+                    start_time = time.time()
+                    response = await client.request(method.upper(), url, **kwargs)
+                    response_time = time.time() - start_time
+                NODE_REQUEST_SECONDS.labels(self.address, _operation(url)).observe(
+                    response_time
+                )
+                
+                if response.status_code >= 500:
+                    # A failing node agent is retried like an unreachable one
+                    if attempt == self.max_retries:
+                        breaker.record_failure()
+                        NODE_REQUEST_ERRORS.labels(self.address, _operation(url)).inc()
+                        logger.warning(
+                            f"HTTP {response.status_code} on {url} after {attempt + 1} attempts"
+                        )
+                        return None, None
+                    continue
+                breaker.record_success()
+                
+                response.raise_for_status()
+                
+                return response, response_time
+                
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error_type = "Timeout" if isinstance(e, httpx.TimeoutException) else "Connection error"
+                if attempt == self.max_retries:
+                    breaker.record_failure()
+                    NODE_REQUEST_ERRORS.labels(self.address, _operation(url)).inc()
+                    logger.warning(f"{error_type} on {url} after {attempt + 1} attempts")
+                    return None, None
+                    
+            except httpx.HTTPError as e:
+                logger.warning(f"Request error on {url}: {str(e)[:100]}")
+                return None, None
+        
+        return None, None
 
     def check_node(self) -> Tuple[bool, Optional[float]]:
         """Checks the node status and sets new settings if necessary.
@@ -130,6 +239,7 @@ class NodeRequests:
             try:
                 json_data = response.json()
                 if json_data.get("success"):
+                    _record_features(self.address, json_data.get("data") or {})
                     return True, response_time
             except Exception:
                 pass
@@ -155,6 +265,7 @@ class NodeRequests:
                 json_data = response.json()
                 if json_data.get("success"):
                     node_data = json_data.get("data", {})
+                    _record_features(self.address, node_data)
                     node_data["response_time"] = response_time
                     return node_data
             except Exception:
@@ -205,6 +316,31 @@ class NodeRequests:
         
         return False
 
+    async def create_user_async(self, name: str) -> bool:
+        """Async version of create_user."""
+        api = f"http://{self.address}/sync/create-user"
+        data = {"name": name}
+        
+        response, _ = await self._make_request_async(
+            "POST", api, headers=self.headers, json=data
+        )
+        
+        if response and response.status_code == 200:
+            try:
+                json_data = response.json()
+                if json_data.get("success"):
+                    return True
+                else:
+                    logger.error(
+                        f"Failed to create user on node {self.address}: {json_data.get('msg')}"
+                    )
+                    return False
+            except Exception as e:
+                logger.error(f"Error parsing create user response from {self.address}: {e}")
+                return False
+        
+        return False
+
     # def update_user(self):
     #     pass
 
@@ -226,6 +362,99 @@ class NodeRequests:
         logger.error(f"Error downloading OVPN client from node {self.address}")
         return None
 
+    async def download_ovpn_client_async(self, name: str) -> Response:
+        """Async version of download_ovpn_client."""
+        api = f"http://{self.address}/sync/download/ovpn/{name}"
+        
+        response, _ = await self._make_request_async("GET", api, headers=self.headers)
+        
+        if response and response.status_code == 200:
+            return Response(
+                content=response.content,
+                media_type="application/x-openvpn-profile",
+                headers={
+                    "Content-Disposition": f"attachment; filename={name}.ovpn"
+                },
+            )
+        
+        logger.error(f"Error downloading OVPN client from node {self.address}")
+        return None
+
+    async def stream_ovpn_client_async(
+        self, name: str
+    ) -> Tuple[Optional[StreamingResponse], Optional[int]]:
+        """Stream OVPN client configuration from the node without buffering it.
+        
+        Content-Length and Content-Encoding are passed through. The node's
+        ETag is not: the panel's own ETag is the sha256 of the whole profile,
+        and a client must not get two different ETags for one profile. The
+        upstream response is closed when the body is done or when the client
+        goes away.
+        
+        Returns:
+            Tuple of (response or None, node HTTP status or None when the
+            node could not be reached)
+        """
+        api = f"http://{self.address}/sync/download/ovpn/{name}"
+        client = get_client(self.address)
+        breaker = get_breaker(self.address)
+        request = client.build_request(
+            "GET", api, headers=self.headers, timeout=self.timeout
+        )
+        
+        if not breaker.allow_request():
+            return None, None
+        
+        response = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with fanout.slot(self.address, self.priority):
+                    start_time = time.time()
+                    response = await client.send(request, stream=True)
+                    NODE_REQUEST_SECONDS.labels(self.address, _operation(api)).observe(
+                        time.time() - start_time
+                    )
+                break
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt == self.max_retries:
+                    breaker.record_failure()
+                    NODE_REQUEST_ERRORS.labels(self.address, _operation(api)).inc()
+                    logger.warning(f"Error on {api} after {attempt + 1} attempts: {e}")
+                    return None, None
+        
+        if response.status_code >= 500:
+            breaker.record_failure()
+            NODE_REQUEST_ERRORS.labels(self.address, _operation(api)).inc()
+        else:
+            breaker.record_success()
+        
+        if response.status_code != 200:
+            await response.aclose()
+            logger.error(
+                f"Error downloading OVPN client from node {self.address}: "
+                f"HTTP {response.status_code}"
+            )
+            return None, response.status_code
+        
+        headers = {"Content-Disposition": f"attachment; filename={name}.ovpn"}
+        for header in ("content-length", "content-encoding"):
+            if header in response.headers:
+                headers[header] = response.headers[header]
+        
+        async def body():
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await response.aclose()
+        
+        return StreamingResponse(
+            body(),
+            media_type="application/x-openvpn-profile",
+            headers=headers,
+            background=BackgroundTask(response.aclose),
+        ), response.status_code
+
     def delete_user(self, name: str) -> bool:
         """Delete user from node."""
         api = f"http://{self.address}/sync/delete-user"
@@ -251,6 +480,31 @@ class NodeRequests:
         
         return False
 
+    async def delete_user_async(self, name: str) -> bool:
+        """Async version of delete_user."""
+        api = f"http://{self.address}/sync/delete-user"
+        data = {"name": name}
+        
+        response, _ = await self._make_request_async(
+            "POST", api, headers=self.headers, json=data
+        )
+        
+        if response and response.status_code == 200:
+            try:
+                json_data = response.json()
+                if json_data.get("success"):
+                    return True
+                else:
+                    logger.error(
+                        f"Failed to delete user on node {self.address}: {json_data.get('msg')}"
+                    )
+                    return False
+            except Exception as e:
+                logger.error(f"Error parsing delete user response from {self.address}: {e}")
+                return False
+        
+        return False
+
     def get_all_users(self) -> list:
         """Get all users from node."""
         api = f"http://{self.address}/sync/users"
@@ -272,3 +526,104 @@ class NodeRequests:
                 return []
         
         return []
+
+    async def get_all_users_async(self) -> Optional[list]:
+        """Async version of get_all_users.
+        
+        Unlike the sync version it returns ``None`` when the node could not
+        be listed, so callers can tell a failure apart from an empty node.
+        """
+        api = f"http://{self.address}/sync/users"
+        
+        response, _ = await self._make_request_async("GET", api, headers=self.headers)
+        
+        if response and response.status_code == 200:
+            try:
+                json_data = response.json()
+                if json_data.get("success"):
+                    return json_data.get("data") or []
+                else:
+                    logger.error(
+                        f"Failed to get users from node {self.address}: {json_data.get('msg')}"
+                    )
+                    return None
+            except Exception as e:
+                logger.error(f"Error parsing users from {self.address}: {e}")
+                return None
+        
+        return None
+
+    async def supports_batch_async(self) -> bool:
+        """Whether the node agent advertises batched user operations.
+        
+        Uses the features learned from the last get-status response and only
+        asks the node when nothing is known yet.
+        """
+        if self.address not in _batch_support:
+            await self.get_node_info_async()
+        return _batch_support.get(self.address, False)
+
+    async def _batch_users_async(
+        self, endpoint: str, names: List[str], fallback
+    ) -> Dict[str, bool]:
+        """Send a batched user operation in chunks of NODE_BATCH_SIZE.
+        
+        Falls back to one request per user (bounded by the fan-out executor's
+        per-node cap) when the node does not support batching.
+        
+        Returns:
+            dict mapping each user name to whether the operation succeeded
+        """
+        if not names:
+            return {}
+        
+        if not await self.supports_batch_async():
+            outcomes = await asyncio.gather(*[fallback(name) for name in names])
+            return dict(zip(names, outcomes))
+        
+        api = f"http://{self.address}/sync/{endpoint}"
+        results = {}
+        
+        for i in range(0, len(names), config.NODE_BATCH_SIZE):
+            chunk = names[i : i + config.NODE_BATCH_SIZE]
+            results.update({name: False for name in chunk})
+            
+            response, _ = await self._make_request_async(
+                "POST", api, headers=self.headers, json={"names": chunk}
+            )
+            
+            if not (response and response.status_code == 200):
+                continue
+            
+            try:
+                json_data = response.json()
+                if not json_data.get("success"):
+                    logger.error(
+                        f"Batch {endpoint} failed on node {self.address}: {json_data.get('msg')}"
+                    )
+                    continue
+                
+                for item in json_data.get("data", {}).get("results", []):
+                    if item.get("name") in results:
+                        results[item["name"]] = bool(item.get("success"))
+                        if not item.get("success"):
+                            logger.warning(
+                                f"Batch {endpoint} failed for '{item['name']}' "
+                                f"on node {self.address}: {item.get('msg')}"
+                            )
+            except Exception as e:
+                logger.error(f"Error parsing batch {endpoint} response from {self.address}: {e}")
+        
+        return results
+
+    async def create_users_async(self, names: List[str]) -> Dict[str, bool]:
+        """Create many users on node, batched when the node supports it."""
+        return await self._batch_users_async(
+            "create-users", names, self.create_user_async
+        )
+
+    async def delete_users_async(self, names: List[str]) -> Dict[str, bool]:
+        """Delete many users from node, batched when the node supports it."""
+        return await self._batch_users_async(
+            "delete-users", names, self.delete_user_async
+        )
@@ -4,10 +4,14 @@ import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from backend.logger import logger
-from sqlalchemy.orm import Session
-from backend.db.engine import sessionLocal
-from backend.node.health_check import HealthCheckService
+from backend.db.engine import asyncSessionLocal, sessionLocal
+from backend.node.probe_scheduler import ProbeScheduler
+from backend.node.health_history import health_history
 from backend.node.sync import SyncService
+from backend.node.outbox import OutboxService
+from backend.config import config
+from backend.metrics import instrument_scheduler
+from backend.db import async_crud, crud
 
 
 class BackgroundScheduler:
@@ -15,39 +19,20 @@ class BackgroundScheduler:
     
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
+        instrument_scheduler(self.scheduler)
+        self.probes = ProbeScheduler()
         self.is_running = False
     
     def get_db(self):
-        """Get database session."""
-        db = sessionLocal()
-        try:
-            return db
-        finally:
-            pass  # Don't close here, will be closed after job
+        """Get async database session, closed by the job."""
+        return asyncSessionLocal()
     
-    async def health_check_job(self):
-        """Scheduled job to check health of all nodes."""
-        db = self.get_db()
+    async def health_probe_job(self):
+        """Scheduled tick starting the per-node health probes that are due."""
         try:
-            logger.info("Running scheduled health check...")
-            health_service = HealthCheckService(db)
-            results = await health_service.check_all_nodes()
-            
-            healthy_count = sum(1 for r in results if r.get("is_healthy"))
-            logger.info(
-                f"Scheduled health check completed: "
-                f"{healthy_count}/{len(results)} nodes healthy"
-            )
-            
-            # Try to recover unhealthy nodes
-            recovered = await health_service.auto_recover_nodes()
-            if recovered:
-                logger.info(f"Auto-recovered {len(recovered)} nodes")
-                
+            await self.probes.tick()
         except Exception as e:
-            logger.error(f"Error in health check job: {e}")
-        finally:
-            db.close()
+            logger.error(f"Error in health probe job: {e}")
     
     async def sync_pending_job(self):
         """Scheduled job to sync pending nodes."""
@@ -69,7 +54,7 @@ class BackgroundScheduler:
         except Exception as e:
             logger.error(f"Error in sync pending job: {e}")
         finally:
-            db.close()
+            await db.close()
     
     async def full_sync_job(self):
         """Scheduled job for full system sync (runs less frequently)."""
@@ -90,7 +75,24 @@ class BackgroundScheduler:
         except Exception as e:
             logger.error(f"Error in full sync job: {e}")
         finally:
-            db.close()
+            await db.close()
+    
+    async def outbox_job(self):
+        """Scheduled job to drain the node operation outbox."""
+        db = self.get_db()
+        try:
+            await OutboxService(db).drain()
+        except Exception as e:
+            logger.error(f"Error in outbox job: {e}")
+        finally:
+            await db.close()
+    
+    async def health_rollup_job(self):
+        """Scheduled job to roll up health history and apply its retention."""
+        try:
+            await async_crud.write(health_history.rollup)
+        except Exception as e:
+            logger.error(f"Error in health rollup job: {e}")
     
     def start(self):
         """Start the background scheduler."""
@@ -99,12 +101,21 @@ class BackgroundScheduler:
             return
         
         try:
-            # Health check every 10 seconds
+            # Operations left running by a previous process are retried
+            db = sessionLocal()
+            try:
+                requeued = crud.requeue_running_node_operations(db)
+                if requeued:
+                    logger.info(f"Requeued {requeued} interrupted outbox operations")
+            finally:
+                db.close()
+            
+            # Per-node health probes, each on its own adaptive interval
             self.scheduler.add_job(
-                self.health_check_job,
-                trigger=IntervalTrigger(seconds=10),
-                id="health_check",
-                name="Health Check All Nodes",
+                self.health_probe_job,
+                trigger=IntervalTrigger(seconds=1),
+                id="health_probe",
+                name="Health Probe Nodes",
                 replace_existing=True,
             )
             
@@ -126,13 +137,36 @@ class BackgroundScheduler:
                 replace_existing=True,
             )
             
+            # Drain node operation outbox
+            self.scheduler.add_job(
+                self.outbox_job,
+                trigger=IntervalTrigger(seconds=config.OUTBOX_POLL_INTERVAL),
+                id="outbox",
+                name="Drain Node Operation Outbox",
+                replace_existing=True,
+            )
+            
+            # Roll up health history into hourly buckets
+            self.scheduler.add_job(
+                self.health_rollup_job,
+                trigger=IntervalTrigger(minutes=5),
+                id="health_rollup",
+                name="Roll Up Health History",
+                replace_existing=True,
+            )
+            
             self.scheduler.start()
             self.is_running = True
             logger.info("Background scheduler started successfully")
             logger.info("Jobs scheduled:")
-            logger.info("  - Health check: every 10 seconds")
+            logger.info(
+                f"  - Health probes: every {config.HEALTH_MIN_INTERVAL}-"
+                f"{config.HEALTH_MAX_INTERVAL} seconds per node"
+            )
             logger.info("  - Sync pending: every 30 seconds")
             logger.info("  - Full sync: every 5 minutes")
+            logger.info(f"  - Outbox: every {config.OUTBOX_POLL_INTERVAL} seconds")
+            logger.info("  - Health history rollup: every 5 minutes")
             
         except Exception as e:
             logger.error(f"Failed to start scheduler: {e}")
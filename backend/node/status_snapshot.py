@@ -0,0 +1,163 @@
+"""Shared snapshot of live node status for dashboards.
+
+Health probes and node heartbeats record every node's live status (CPU,
+memory, response time) here, so dashboard requests are served from memory
+instead of querying every node per request. Entries older than NODE_STATUS_TTL are
+refreshed in the background; a node already being refreshed is not
+requested again, concurrent refreshes of it share that run.
+"""
+
+from typing import Dict, List, Optional
+from datetime import datetime
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import config
+from backend.db import async_crud
+from backend.logger import logger
+from backend.node.requests import NodeRequests
+
+
+class NodeStatusSnapshot:
+    """Latest live status of every node, keyed by node id."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[int, dict] = {}
+        # In-flight refresh of each node, by node id
+        self._refreshing: Dict[int, asyncio.Task] = {}
+
+    def record(self, node_id: int, live_data: Optional[dict]) -> None:
+        """Store the result of a status request; empty data means offline."""
+        self._entries[node_id] = {
+            "live_data": live_data or None,
+            "updated_at": time.time(),
+        }
+
+    def get(self, node_id: int) -> Optional[dict]:
+        """Last recorded live data of a node, None if unknown or offline."""
+        entry = self._entries.get(node_id)
+        return entry["live_data"] if entry else None
+
+    def invalidate(self, node_id: int) -> None:
+        self._entries.pop(node_id, None)
+
+    def _is_stale(self, node, now: float) -> bool:
+        entry = self._entries.get(node.id)
+        return entry is None or now - entry["updated_at"] > self.ttl
+
+    async def _fetch(self, node) -> None:
+        node_request = NodeRequests(
+            address=node.address,
+            port=node.port,
+            api_key=node.key,
+            tunnel_addres=node.tunnel_address or "ovpanel.com",
+            protocol=node.protocol,
+            ovpn_port=node.ovpn_port,
+            timeout=3,  # Quick timeout
+            max_retries=0,  # No retries for speed
+        )
+        try:
+            live_data = await node_request.get_node_info_async()
+        except Exception as e:
+            logger.warning(f"Failed to get live status for node {node.address}: {e}")
+            live_data = None
+        self.record(node.id, live_data)
+
+    async def _refresh_nodes(self, nodes) -> None:
+        try:
+            await asyncio.gather(*[self._fetch(node) for node in nodes])
+        finally:
+            task = asyncio.current_task()
+            for node in nodes:
+                if self._refreshing.get(node.id) is task:
+                    del self._refreshing[node.id]
+
+    def _running(self, nodes) -> set:
+        return {self._refreshing[node.id] for node in nodes if node.id in self._refreshing}
+
+    def refresh(self, nodes) -> asyncio.Future:
+        """Refresh the given nodes, joining the refreshes already covering some.
+
+        Only the nodes no refresh covers yet are requested, in a new run;
+        the returned future completes once every given node is refreshed.
+        """
+        missing = [node for node in nodes if node.id not in self._refreshing]
+        if missing:
+            task = asyncio.create_task(self._refresh_nodes(missing))
+            for node in missing:
+                self._refreshing[node.id] = task
+        return asyncio.gather(*self._running(nodes))
+
+    async def get_nodes(self, db: AsyncSession, fresh: bool = False) -> List[dict]:
+        """Nodes with their live status from the snapshot.
+
+        Stale entries are served as-is while a background refresh runs.
+        The caller only waits for a refresh when fresh is set or an active
+        node has never been seen yet.
+        """
+        nodes = await async_crud.get_all_nodes(db)
+        active_nodes = [node for node in nodes if node.status]
+        now = time.time()
+
+        if fresh:
+            # A running refresh may predate the caller, so start a new one
+            running = self._running(active_nodes)
+            if running:
+                await asyncio.shield(asyncio.gather(*running))
+            await asyncio.shield(self.refresh(active_nodes))
+        else:
+            stale = [node for node in active_nodes if self._is_stale(node, now)]
+            if stale:
+                task = self.refresh(stale)
+                if any(node.id not in self._entries for node in stale):
+                    await asyncio.shield(task)
+
+        return [self._node_status(node) for node in nodes]
+
+    def _node_status(self, node) -> dict:
+        node_info = {
+            "id": node.id,
+            "name": node.name,
+            "address": node.address,
+            "tunnel_address": node.tunnel_address,
+            "ovpn_port": node.ovpn_port,
+            "protocol": node.protocol,
+            "port": node.port,
+            "status": "offline",
+            "is_healthy": False,
+            "cpu_usage": None,
+            "memory_usage": None,
+            "node_status": None,
+            "response_time": None,
+            "last_health_check": str(node.last_health_check) if node.last_health_check else None,
+            "sync_status": node.sync_status,
+            "status_updated_at": None,
+        }
+
+        entry = self._entries.get(node.id)
+        if entry is None:
+            return node_info
+
+        node_info["status_updated_at"] = entry["updated_at"]
+        # Probes only persist last_health_check when something changed
+        node_info["last_health_check"] = str(datetime.fromtimestamp(entry["updated_at"]))
+        live_data = entry["live_data"]
+        # Only active nodes are reported online
+        if node.status and live_data:
+            response_time = live_data.get("response_time")
+            node_info.update({
+                "status": "online",
+                "is_healthy": True,
+                "cpu_usage": live_data.get("cpu_usage"),
+                "memory_usage": live_data.get("memory_usage"),
+                "node_status": live_data.get("status"),
+                "response_time": round(response_time, 3) if response_time else None,
+            })
+        return node_info
+
+
+# Global snapshot instance
+status_snapshot = NodeStatusSnapshot(ttl=config.NODE_STATUS_TTL)
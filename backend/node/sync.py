@@ -1,17 +1,23 @@
 """Synchronization service for keeping nodes in sync."""
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from backend.db import crud
+from backend.db import async_crud, crud
 from backend.node.requests import NodeRequests
+from backend.node.fanout import PRIORITY_SYNC
+from backend.node.outbox import LIVE_OPERATION_STATES, OutboxService
+from backend.config import config
 from backend.logger import logger
-from typing import List, Dict
+from backend.metrics import record_sync
+from typing import List, Dict, Optional, Tuple
 import asyncio
+import time
 
 
 class SyncService:
     """Service for synchronizing data between nodes."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
     async def sync_user_to_node(self, user_name: str, node) -> dict:
@@ -31,7 +37,7 @@ class SyncService:
             
             # Create user with node-specific name
             user_name_with_node = f"{user_name}-{node.name}"
-            success = node_request.create_user(user_name_with_node)
+            success = await node_request.create_user_async(user_name_with_node)
             
             if success:
                 logger.info(f"Synced user '{user_name_with_node}' to node {node.address}")
@@ -62,48 +68,124 @@ class SyncService:
                 "error": str(e),
             }
 
+    @staticmethod
+    def plan_node_sync(
+        db_users: List[str],
+        node_users: Optional[List],
+        node_name: str,
+        placed_users: List[str],
+    ) -> Tuple[List[str], List[str]]:
+        """Diff DB users against the users present on a node.
+        
+        Node users follow the ``{name}-{node.name}`` naming scheme. Only
+        users the panel placed on this node (its NodeUser rows) are
+        considered for deletion: a name suffix alone cannot tell which node
+        an account belongs to once names contain hyphens, and accounts the
+        panel did not create are left alone. When the node's user list is
+        unknown (``None``) every DB user is planned for creation.
+        
+        Returns:
+            Tuple of (names_to_create, names_to_delete)
+        """
+        desired = {f"{name}-{node_name}" for name in db_users}
+        
+        if node_users is None:
+            return sorted(desired), []
+        
+        present = {
+            item.get("name") if isinstance(item, dict) else item
+            for item in node_users
+        }
+        present.discard(None)
+        placed = {f"{name}-{node_name}" for name in placed_users}
+        
+        to_create = sorted(desired - present)
+        to_delete = sorted((placed - desired) & present)
+        return to_create, to_delete
+
     async def sync_all_users_to_node(self, node) -> dict:
-        """Sync all users from database to a specific node.
+        """Reconcile the users on a node with the database.
+        
+        Fetches the node's user set once and only pushes the delta, so a
+        node that is already in sync costs a single request.
         
         Returns:
-            dict with sync statistics
+            dict with sync statistics and the size of the sync plan
         """
         try:
-            # Get all active users from database
-            users = crud.get_all_users(self.db)
+            users = await async_crud.get_all_users(self.db)
             
-            if not users:
-                logger.info(f"No users to sync to node {node.address}")
-                return {
-                    "node_id": node.id,
-                    "address": node.address,
-                    "total_users": 0,
-                    "synced": 0,
-                    "failed": 0,
-                }
+            node_request = NodeRequests(
+                address=node.address,
+                port=node.port,
+                api_key=node.key,
+                timeout=10,
+                max_retries=2,
+                priority=PRIORITY_SYNC,
+            )
             
-            logger.info(f"Syncing {len(users)} users to node {node.address}")
+            node_users = await node_request.get_all_users_async()
+            if node_users is None:
+                logger.warning(
+                    f"Could not list users on node {node.address}, pushing all users"
+                )
             
-            # Sync all users
-            tasks = [self.sync_user_to_node(user.name, node) for user in users]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            placements = await async_crud.get_node_users(self.db, node.id)
+            to_create, to_delete = self.plan_node_sync(
+                [user.name for user in users],
+                node_users,
+                node.name,
+                [row.user_name for row in placements],
+            )
+            # Placements with a live outbox operation are converged by the outbox
+            outboxed = await async_crud.get_node_operation_user_ids(
+                self.db, node.id, LIVE_OPERATION_STATES
+            )
+            skipped = {
+                f"{row.user_name}-{node.name}"
+                for row in placements
+                if row.user_id in outboxed
+            }
+            to_create = [name for name in to_create if name not in skipped]
+            to_delete = [name for name in to_delete if name not in skipped]
+            
+            logger.info(
+                f"Sync plan for node {node.address}: "
+                f"{len(to_create)} to create, {len(to_delete)} to delete "
+                f"({len(users)} users in database)"
+            )
+            
+            # Batched when the node supports it, per-user otherwise
+            created = await node_request.create_users_async(to_create)
+            deleted = await node_request.delete_users_async(to_delete)
             
             # Count successes and failures
-            valid_results = [r for r in results if isinstance(r, dict)]
-            synced_count = sum(1 for r in valid_results if r.get("success"))
-            failed_count = len(valid_results) - synced_count
+            create_failed = sum(1 for success in created.values() if not success)
+            delete_failed = sum(1 for success in deleted.values() if not success)
+            synced_count = len(users) - create_failed
+            failed_count = create_failed + delete_failed
+            
+            await async_crud.write(
+                self._record_reconcile,
+                node,
+                users,
+                node_users is not None,
+                created,
+                deleted,
+                outboxed,
+            )
             
             # Update node sync status
             if failed_count == 0:
-                crud.update_node_sync_status(self.db, node.id, "synced")
+                await async_crud.update_node_sync_status(self.db, node.id, "synced")
             elif synced_count > 0:
-                crud.update_node_sync_status(self.db, node.id, "pending")
+                await async_crud.update_node_sync_status(self.db, node.id, "pending")
             else:
-                crud.update_node_sync_status(self.db, node.id, "failed")
+                await async_crud.update_node_sync_status(self.db, node.id, "failed")
             
             logger.info(
                 f"Sync completed for node {node.address}: "
-                f"{synced_count} succeeded, {failed_count} failed"
+                f"{synced_count} users in sync, {failed_count} failed"
             )
             
             return {
@@ -112,11 +194,193 @@ class SyncService:
                 "total_users": len(users),
                 "synced": synced_count,
                 "failed": failed_count,
+                "plan": {
+                    "create": len(to_create),
+                    "delete": len(to_delete),
+                },
+                "created": len(created) - create_failed,
+                "deleted": len(deleted) - delete_failed,
             }
             
         except Exception as e:
             logger.error(f"Error syncing users to node {node.address}: {e}")
-            crud.update_node_sync_status(self.db, node.id, "failed")
+            await async_crud.update_node_sync_status(self.db, node.id, "failed")
+            return {
+                "node_id": node.id,
+                "address": node.address,
+                "error": str(e),
+            }
+
+    def _record_reconcile(
+        self,
+        db: Session,
+        node,
+        users: list,
+        listed: bool,
+        created: Dict[str, bool],
+        deleted: Dict[str, bool],
+        outboxed: set,
+    ) -> None:
+        """Store the user placements observed and changed by a reconcile.
+        
+        Placements already recorded as present are left alone, so a reconcile
+        that changed nothing writes nothing. Placements owned by the outbox
+        (``outboxed`` user ids) are not touched.
+        """
+        # Read before writing, rows expire once a write commits
+        rows = {
+            row.user_id: row
+            for row in crud.get_node_users(db, node.id)
+            if row.user_id not in outboxed
+        }
+        present, failed = [], []
+        for user in users:
+            if user.id in outboxed:
+                continue
+            if not created.get(f"{user.name}-{node.name}", True):
+                failed.append((user.id, user.name))
+                continue
+            row = rows.get(user.id)
+            if row is None or row.state != "present" or row.user_name != user.name:
+                present.append((user.id, user.name))
+        
+        # Placements of users that no longer exist in the database
+        user_ids = {user.id for user in users}
+        gone, delete_failed, unknown = [], [], []
+        for row in rows.values():
+            if row.user_id in user_ids:
+                continue
+            success = deleted.get(f"{row.user_name}-{node.name}")
+            if success or (success is None and listed):
+                gone.append(row.user_id)
+            elif success is False:
+                delete_failed.append((row.user_id, row.user_name))
+            else:
+                unknown.append((row.user_id, row.user_name))
+        
+        crud.set_node_users_state(db, node.id, present, "present")
+        crud.set_node_users_state(
+            db,
+            node.id,
+            failed,
+            "failed",
+            error="create failed on node",
+            count_attempt=True,
+        )
+        crud.delete_node_users(db, node.id, gone)
+        crud.set_node_users_state(
+            db,
+            node.id,
+            delete_failed,
+            "deleting",
+            error="delete failed on node",
+            count_attempt=True,
+        )
+        crud.set_node_users_state(db, node.id, unknown, "deleting")
+
+    async def converge_node(self, node) -> dict:
+        """Retry only the user placements of a node that have not converged.
+        
+        Returns:
+            dict with sync statistics and the size of the sync plan
+        """
+        try:
+            rows = await async_crud.get_node_users(
+                self.db, node.id, states=["pending", "failed", "deleting"]
+            )
+            # Placements with a live outbox operation are converged by the outbox
+            outboxed = await async_crud.get_node_operation_user_ids(
+                self.db, node.id, LIVE_OPERATION_STATES
+            )
+            rows = [row for row in rows if row.user_id not in outboxed]
+            to_create = {
+                f"{row.user_name}-{node.name}": row
+                for row in rows
+                if row.state != "deleting"
+            }
+            to_delete = {
+                f"{row.user_name}-{node.name}": row
+                for row in rows
+                if row.state == "deleting"
+            }
+            
+            logger.info(
+                f"Converging node {node.address}: "
+                f"{len(to_create)} to create, {len(to_delete)} to delete"
+            )
+            
+            node_request = NodeRequests(
+                address=node.address,
+                port=node.port,
+                api_key=node.key,
+                timeout=10,
+                max_retries=2,
+                priority=PRIORITY_SYNC,
+            )
+            
+            created = await node_request.create_users_async(list(to_create))
+            deleted = await node_request.delete_users_async(list(to_delete))
+            
+            def placements(rows_by_name: dict, names: list) -> list:
+                return [
+                    (rows_by_name[n].user_id, rows_by_name[n].user_name) for n in names
+                ]
+            
+            create_ok = [n for n, success in created.items() if success]
+            create_failed = [n for n, success in created.items() if not success]
+            delete_ok = [n for n, success in deleted.items() if success]
+            delete_failed = [n for n, success in deleted.items() if not success]
+            
+            await async_crud.set_node_users_state(
+                self.db, node.id, placements(to_create, create_ok), "present"
+            )
+            await async_crud.set_node_users_state(
+                self.db,
+                node.id,
+                placements(to_create, create_failed),
+                "failed",
+                error="create failed on node",
+                count_attempt=True,
+            )
+            await async_crud.delete_node_users(
+                self.db, node.id, [to_delete[n].user_id for n in delete_ok]
+            )
+            await async_crud.set_node_users_state(
+                self.db,
+                node.id,
+                placements(to_delete, delete_failed),
+                "deleting",
+                error="delete failed on node",
+                count_attempt=True,
+            )
+            
+            synced_count = len(create_ok) + len(delete_ok)
+            failed_count = len(create_failed) + len(delete_failed)
+            
+            if failed_count == 0:
+                await async_crud.update_node_sync_status(self.db, node.id, "synced")
+            elif synced_count > 0:
+                await async_crud.update_node_sync_status(self.db, node.id, "pending")
+            else:
+                await async_crud.update_node_sync_status(self.db, node.id, "failed")
+            
+            return {
+                "node_id": node.id,
+                "address": node.address,
+                "total_users": len(rows),
+                "synced": synced_count,
+                "failed": failed_count,
+                "plan": {
+                    "create": len(to_create),
+                    "delete": len(to_delete),
+                },
+                "created": len(create_ok),
+                "deleted": len(delete_ok),
+            }
+            
+        except Exception as e:
+            logger.error(f"Error converging users on node {node.address}: {e}")
+            await async_crud.update_node_sync_status(self.db, node.id, "failed")
             return {
                 "node_id": node.id,
                 "address": node.address,
@@ -130,19 +394,21 @@ class SyncService:
             List of sync results for each node
         """
         # Get only healthy nodes
-        nodes = crud.get_healthy_nodes(self.db)
+        nodes = await async_crud.get_healthy_nodes(self.db)
         
         if not nodes:
             logger.warning("No healthy nodes available for sync")
             return []
         
         logger.info(f"Starting full sync for {len(nodes)} healthy nodes")
+        started = time.perf_counter()
         
         # Sync all nodes concurrently
         tasks = [self.sync_all_users_to_node(node) for node in nodes]
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         valid_results = [r for r in results if isinstance(r, dict)]
+        record_sync("full", time.perf_counter() - started, valid_results)
         
         total_synced = sum(r.get("synced", 0) for r in valid_results)
         total_failed = sum(r.get("failed", 0) for r in valid_results)
@@ -155,23 +421,39 @@ class SyncService:
         return valid_results
 
     async def sync_pending_nodes(self) -> List[dict]:
-        """Sync only nodes that have pending sync status.
+        """Sync nodes that are pending or have unconverged user placements.
+        
+        Nodes whose placements are tracked only retry the rows that have not
+        converged. Nodes that were never synced, drifted from their
+        placements or have no tracked placements yet get a full reconcile.
         
         Returns:
             List of sync results for pending nodes
         """
-        nodes = crud.get_nodes_needing_sync(self.db)
+        nodes = {
+            node.id: node for node in await async_crud.get_nodes_needing_sync(self.db)
+        }
+        for node in await async_crud.get_nodes_with_unconverged_users(self.db):
+            nodes.setdefault(node.id, node)
         
         if not nodes:
             logger.info("No nodes need sync")
             return []
         
         logger.info(f"Syncing {len(nodes)} nodes with pending status")
+        started = time.perf_counter()
         
-        tasks = [self.sync_all_users_to_node(node) for node in nodes]
+        tasks = []
+        for node in nodes.values():
+            full = node.sync_status in ("never_synced", "drifted")
+            if full or not await async_crud.count_node_users(self.db, node.id):
+                tasks.append(self.sync_all_users_to_node(node))
+            else:
+                tasks.append(self.converge_node(node))
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         valid_results = [r for r in results if isinstance(r, dict)]
+        record_sync("pending", time.perf_counter() - started, valid_results)
         
         logger.info(f"Pending sync completed for {len(valid_results)} nodes")
         
@@ -186,7 +468,14 @@ class SyncService:
         Returns:
             List of sync results
         """
-        nodes = crud.get_healthy_nodes(self.db)
+        user = await async_crud.get_user_by_name(self.db, user_name)
+        placement = [(user.id, user.name)] if user else []
+        
+        # Every node owes this user, unhealthy ones converge on recovery
+        for node in await async_crud.get_all_nodes(self.db):
+            await async_crud.set_node_users_state(self.db, node.id, placement, "pending")
+        
+        nodes = await async_crud.get_healthy_nodes(self.db)
         
         if not nodes:
             logger.warning(f"No healthy nodes to sync user '{user_name}'")
@@ -200,64 +489,85 @@ class SyncService:
         valid_results = [r for r in results if isinstance(r, dict)]
         success_count = sum(1 for r in valid_results if r.get("success"))
         
+        for r in valid_results:
+            if r.get("success"):
+                await async_crud.set_node_users_state(
+                    self.db, r["node_id"], placement, "present"
+                )
+            else:
+                await async_crud.set_node_users_state(
+                    self.db,
+                    r["node_id"],
+                    placement,
+                    "failed",
+                    error=r.get("error", "create failed on node"),
+                    count_attempt=True,
+                )
+        
         logger.info(
             f"User '{user_name}' synced to {success_count}/{len(valid_results)} nodes"
         )
         
         return valid_results
 
-    async def delete_user_from_all_nodes(self, user_name: str) -> List[dict]:
-        """Delete a user from all nodes.
+    async def delete_user_from_all_nodes(
+        self, user_name: str, deadline: Optional[float] = None
+    ) -> List[dict]:
+        """Delete a user from all nodes concurrently, within a deadline.
+        
+        The deletions are queued in the outbox first and then run inline
+        against the healthy nodes. Nodes that are down, fail, or do not
+        answer before the deadline keep their queued operation and are
+        retried by the background drain.
         
         Args:
             user_name: Name of the user to delete
+            deadline: Seconds to wait for the nodes (NODE_DELETE_DEADLINE by default)
             
         Returns:
-            List of deletion results
+            List of deletion results, one per node with a queued deletion
         """
-        nodes = crud.get_all_nodes(self.db)
+        outbox = OutboxService(self.db)
+        operations = await outbox.enqueue_user_operation(user_name, "delete")
         
-        if not nodes:
+        if not operations:
             return []
         
-        logger.info(f"Deleting user '{user_name}' from {len(nodes)} nodes")
-        
-        results = []
-        for node in nodes:
-            try:
-                node_request = NodeRequests(
-                    address=node.address,
-                    port=node.port,
-                    api_key=node.key,
-                    timeout=10,
-                    max_retries=2,
-                )
-                
-                user_name_with_node = f"{user_name}-{node.name}"
-                success = node_request.delete_user(user_name_with_node)
-                
-                results.append({
-                    "node_id": node.id,
-                    "address": node.address,
-                    "user": user_name,
-                    "success": success,
-                })
-                
-            except Exception as e:
-                logger.error(
-                    f"Error deleting user '{user_name}' from node {node.address}: {e}"
-                )
-                results.append({
-                    "node_id": node.id,
-                    "address": node.address,
-                    "user": user_name,
-                    "success": False,
-                    "error": str(e),
-                })
+        logger.info(f"Deleting user '{user_name}' from {len(operations)} nodes")
+        
+        finished, left = await outbox.run_now(
+            operations,
+            deadline if deadline is not None else config.NODE_DELETE_DEADLINE,
+        )
+        
+        addresses = {
+            node.id: node.address for node in await async_crud.get_all_nodes(self.db)
+        }
+        results = [
+            {
+                "node_id": operation.node_id,
+                "address": addresses.get(operation.node_id),
+                "user": user_name,
+                "success": success,
+                "queued": not success,
+            }
+            for operation, success in finished
+        ]
+        results.extend(
+            {
+                "node_id": operation.node_id,
+                "address": addresses.get(operation.node_id),
+                "user": user_name,
+                "success": False,
+                "queued": True,
+            }
+            for operation in left
+        )
         
-        success_count = sum(1 for r in results if r.get("success"))
+        success_count = sum(1 for r in results if r["success"])
         logger.info(
-            f"User '{user_name}' deleted from {success_count}/{len(results)} nodes"
+            f"User '{user_name}' deleted from {success_count}/{len(results)} nodes, "
+            f"{len(results) - success_count} queued for retry"
         )
         
         return results
@@ -1,16 +1,26 @@
-from fastapi.responses import Response
-from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 import asyncio
+import time
 
+from backend.config import config
 from backend.logger import logger
 from backend.schema._input import NodeCreate
-from .requests import NodeRequests
-from backend.db import crud
+from .requests import NodeRequests, close_client
+from backend.db import async_crud
 from .health_check import HealthCheckService
 from .sync import SyncService
+from .outbox import OutboxService
+from .profile_cache import CachedProfile, etag_matches, profile_cache
+from .circuit_breaker import reset_breaker
+from .status_snapshot import status_snapshot
+from .health_history import health_history
+from .ranking import node_ranking
+from .heartbeat import node_heartbeats
 
 
-async def add_node_handler(request: NodeCreate, db: Session) -> dict:
+async def add_node_handler(request: NodeCreate, db: AsyncSession) -> dict:
     """Add a new node with health check and sync all users to it.
     
     Returns:
@@ -33,15 +43,15 @@ async def add_node_handler(request: NodeCreate, db: Session) -> dict:
     
     if is_healthy:
         # Create node in database
-        node = crud.create_node(db, request)
+        node = await async_crud.create_node(db, request)
         
         # Update health status
-        crud.update_node_health(
+        await async_crud.update_node_health(
             db, node.id, is_healthy=True, response_time=response_time
         )
         
         # Mark as needing sync
-        crud.update_node_sync_status(db, node.id, "never_synced")
+        await async_crud.update_node_sync_status(db, node.id, "never_synced")
         
         logger.info(f"Node added successfully: {request.address}:{request.port}")
         
@@ -95,18 +105,35 @@ async def add_node_handler(request: NodeCreate, db: Session) -> dict:
         }
 
 
-async def update_node_handler(address: str, request: NodeCreate, db: Session) -> None:
+async def update_node_handler(
+    address: str, request: NodeCreate, db: AsyncSession, port: int = None
+) -> None:
     """Update a node"""
-    crud.update_node(db, address, request)
+    node = await async_crud.get_node_by_address(db, address, port)
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+    # Drop pooled connections to the old endpoint
+    await close_client(f"{node.address}:{node.port}")
+    reset_breaker(f"{node.address}:{node.port}")
+    profile_cache.invalidate_node(node.id)
+    status_snapshot.invalidate(node.id)
+    await async_crud.update_node(db, node.id, request)
     logger.info(f"Node updated successfully: {address}")
     return True
 
 
-async def delete_node_handler(address: str, db: Session) -> bool:
+async def delete_node_handler(address: str, db: AsyncSession, port: int = None) -> bool:
     """Delete a node"""
-    node = crud.get_node_by_address(db, address)
+    node = await async_crud.get_node_by_address(db, address, port)
     if node:
-        crud.delete_node(db, node.id)
+        await close_client(f"{node.address}:{node.port}")
+        reset_breaker(f"{node.address}:{node.port}")
+        profile_cache.invalidate_node(node.id)
+        status_snapshot.invalidate(node.id)
+        health_history.forget(node.id)
+        node_ranking.forget(node.id)
+        node_heartbeats.forget(node.id)
+        await async_crud.delete_node(db, node.id)
         logger.info(f"Node deleted successfully: {address}")
         return True
     else:
@@ -114,14 +141,14 @@ async def delete_node_handler(address: str, db: Session) -> bool:
         return False
 
 
-async def list_nodes_handler(db: Session) -> list:
+async def list_nodes_handler(db: AsyncSession) -> list:
     """Retrieve all nodes with current health status from database only.
     
     Does NOT perform health checks here to avoid blocking.
     Health checks are done by scheduled background tasks.
     """
     nodes_list = []
-    nodes = crud.get_all_nodes(db)
+    nodes = await async_crud.get_all_nodes(db)
     
     for node in nodes:
         # Determine actual status based on health and status
@@ -147,25 +174,20 @@ async def list_nodes_handler(db: Session) -> list:
     return nodes_list
 
 
-async def create_user_on_all_nodes(name: str, db: Session):
-    """Create a user on all healthy nodes only."""
-    sync_service = SyncService(db)
-    results = await sync_service.sync_user_to_all_nodes(name)
-    
-    # Log summary
-    success_count = sum(1 for r in results if r.get("success"))
-    total_nodes = len(results)
-    
-    logger.info(
-        f"User '{name}' created on {success_count}/{total_nodes} healthy nodes"
-    )
+async def create_user_on_all_nodes(name: str, db: AsyncSession) -> int:
+    """Queue creation of a user on all nodes.
     
-    return results
+    The outbox worker pushes it to each node in the background with retries,
+    nodes that are down get it once they recover.
+    """
+    queued = len(await OutboxService(db).enqueue_user_operation(name, "create"))
+    logger.info(f"User '{name}' queued for creation on {queued} nodes")
+    return queued
 
 
-async def get_node_status_handler(address: str, db: Session):
+async def get_node_status_handler(address: str, db: AsyncSession, port: int = None):
     """Get the status of a node with quick async check."""
-    node = crud.get_node_by_address(db, address)
+    node = await async_crud.get_node_by_address(db, address, port)
     if not node:
         return None
     
@@ -196,11 +218,51 @@ async def get_node_status_handler(address: str, db: Session):
     }
 
 
+def _cached_profile_response(
+    profile: CachedProfile, filename: str, if_none_match: str = None
+) -> Response:
+    """Serve a cached profile, or 304 when the client already has it."""
+    if etag_matches(if_none_match, profile.etag):
+        return Response(status_code=304, headers={"ETag": profile.etag})
+    
+    return Response(
+        content=profile.content,
+        media_type="application/x-openvpn-profile",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.ovpn",
+            "ETag": profile.etag,
+        },
+    )
+
+
+async def _cache_while_streaming(chunks, node_id: int, name: str, generation: int):
+    """Pass a profile stream through and cache it once it completed."""
+    buffer, size = [], 0
+    async for chunk in chunks:
+        if buffer is not None:
+            size += len(chunk)
+            if size <= profile_cache.max_entry_bytes:
+                buffer.append(chunk)
+            else:
+                buffer = None  # too large to cache, keep streaming only
+        yield chunk
+    
+    if buffer is not None:
+        profile_cache.put(node_id, name, b"".join(buffer), generation)
+
+
 async def download_ovpn_client_from_node(
-    name: str, node_address: str, db: Session
+    name: str,
+    node_address: str,
+    db: AsyncSession,
+    if_none_match: str = None,
+    node_port: int = None,
 ) -> Response | None:
-    """Download OVPN client from a specific node with health check."""
-    node = crud.get_node_by_address(db, node_address)
+    """Download OVPN client from a specific node with health check.
+    
+    Profiles are served from the cache when possible, honoring If-None-Match.
+    """
+    node = await async_crud.get_node_by_address(db, node_address, node_port)
     
     if not node:
         logger.error(f"Node not found: {node_address}")
@@ -225,27 +287,68 @@ async def download_ovpn_client_from_node(
             f"may not have latest data. Last sync: {node.last_sync_time}"
         )
     
+    return await _download_from_node(name, node, db, if_none_match)
+
+
+async def _download_from_node(
+    name: str, node, db: AsyncSession, if_none_match: str = None, timeout: float = 10
+) -> Response | None:
+    """Serve a profile from the cache or stream it from the node.
+    
+    A profile whose length fits the cache is read whole, cached and served
+    like a cache hit, with its sha256 ETag and If-None-Match honored. Larger,
+    encoded or unsized profiles are streamed through without an ETag. A
+    node that can't be reached or answers 5xx is marked as potentially
+    unhealthy; any other error status (a user not created on it yet, say)
+    only fails this download.
+    """
+    cached = profile_cache.get(node.id, name)
+    if cached:
+        logger.info(f"Serving cached OVPN for user '{name}' from node {node.address}")
+        return _cached_profile_response(cached, f"{name}-{node.name}", if_none_match)
+    
     try:
-        # Use short timeout for download attempt
-        result = NodeRequests(
+        started = time.monotonic()
+        # Read before the download, invalidations during it win over its put
+        generation = profile_cache.generation
+        result, status = await NodeRequests(
             address=node.address,
             port=node.port,
             api_key=node.key,
-            timeout=10,  # 10 seconds for download
+            timeout=timeout,
             max_retries=0,
-        ).download_ovpn_client(f"{name}-{node.name}")
+        ).stream_ovpn_client_async(f"{name}-{node.name}")
         
         if result:
+            node_ranking.observe_download(node.id, time.monotonic() - started)
             logger.info(
                 f"OVPN client downloaded for user '{name}-{node.name}' from node {node.address}"
             )
+            # Encoded bodies are passed through raw and can't be served from cache
+            if "content-encoding" in result.headers:
+                return result
+            length = result.headers.get("content-length")
+            if length is not None and int(length) <= profile_cache.max_entry_bytes:
+                content = b"".join([chunk async for chunk in result.body_iterator])
+                profile = profile_cache.put(
+                    node.id, name, content, generation
+                ) or CachedProfile.of(content)
+                return _cached_profile_response(
+                    profile, f"{name}-{node.name}", if_none_match
+                )
+            result.body_iterator = _cache_while_streaming(
+                result.body_iterator, node.id, name, generation
+            )
             return result
         
-        # If download failed, mark node as potentially unhealthy
         logger.error(
             f"Failed to download OVPN for user '{name}-{node.name}' from node {node.address}"
         )
-        crud.update_node_health(
+        if status is not None and status < 500:
+            return None
+        
+        # The node itself failed, mark it as potentially unhealthy
+        await async_crud.update_node_health(
             db,
             node.id,
             is_healthy=False,
@@ -253,8 +356,8 @@ async def download_ovpn_client_from_node(
         )
         
     except Exception as e:
-        logger.error(f"Exception downloading from node {node_address}: {e}")
-        crud.update_node_health(
+        logger.error(f"Exception downloading from node {node.address}: {e}")
+        await async_crud.update_node_health(
             db,
             node.id,
             is_healthy=False,
@@ -264,29 +367,104 @@ async def download_ovpn_client_from_node(
     return None
 
 
-async def download_ovpn_from_best_node(name: str, db: Session) -> Response | None:
-    """Download OVPN from the best available node."""
-    best_node = crud.get_best_node_for_download(db)
+async def _discard_response(response: Response) -> None:
+    """Release the upstream stream of a download that lost a race."""
+    if isinstance(response, StreamingResponse) and response.background:
+        await response.background()
+
+
+async def download_ovpn_from_best_node(
+    name: str, db: AsyncSession, if_none_match: str = None, hedge: bool = None
+) -> Response | None:
+    """Download OVPN from the ranked nodes, failing over within a deadline.
     
-    if not best_node:
+    Candidates are tried in weighted random order. A failed node makes the
+    next one take over until DOWNLOAD_DEADLINE runs out. With hedging
+    (DOWNLOAD_HEDGE, or the hedge argument) a second node is raced once
+    the first one has taken longer than its recent p95 download latency,
+    and whichever answers first is served.
+    """
+    candidates = node_ranking.order(await async_crud.get_download_candidate_nodes(db))
+    
+    if not candidates:
         logger.error("No healthy nodes available for download")
         return None
     
-    logger.info(f"Selected best node {best_node.address} for download")
-    return await download_ovpn_client_from_node(name, best_node.address, db)
-
-
-async def delete_user_on_all_nodes(name: str, db: Session):
-    """Delete a user from all nodes (even unhealthy ones to cleanup)."""
-    sync_service = SyncService(db)
-    results = await sync_service.delete_user_from_all_nodes(name)
+    hedge = config.DOWNLOAD_HEDGE if hedge is None else hedge
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config.DOWNLOAD_DEADLINE
+    running = {}
     
-    # Log summary
-    success_count = sum(1 for r in results if r.get("success"))
-    total_nodes = len(results)
+    def start_next() -> bool:
+        if not candidates:
+            return False
+        node = candidates.pop(0)
+        timeout = min(10, max(deadline - loop.time(), 0.1))
+        logger.info(f"Selected node {node.address} for download")
+        task = asyncio.create_task(
+            _download_from_node(name, node, db, if_none_match, timeout)
+        )
+        running[task] = node
+        return True
     
-    logger.info(
-        f"User '{name}' deleted from {success_count}/{total_nodes} nodes"
-    )
+    start_next()
+    try:
+        while running:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            
+            wait = remaining
+            if hedge and len(running) == 1 and candidates:
+                (first,) = running.values()
+                wait = min(remaining, node_ranking.hedge_delay(first.id))
+            
+            done, _ = await asyncio.wait(
+                running, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+            )
+            
+            if not done:
+                # The only attempt is slower than usual, race the next node
+                if hedge and len(running) == 1 and start_next():
+                    logger.info(f"Hedging download of '{name}' to a second node")
+                continue
+            
+            winner = None
+            for task in done:
+                node = running.pop(task)
+                result = task.result()
+                if result is None:
+                    logger.warning(f"Download from node {node.address} failed, failing over")
+                elif winner is None:
+                    winner = result
+                else:
+                    await _discard_response(result)
+            
+            if winner is not None:
+                return winner
+            
+            if not running:
+                start_next()
+        
+        logger.error(f"No node answered the download of '{name}' in time")
+        return None
+    
+    finally:
+        for task in running:
+            task.cancel()
+        for task in running:
+            try:
+                result = await task
+            except (asyncio.CancelledError, Exception):
+                continue
+            if result is not None:
+                await _discard_response(result)
+
+
+async def delete_user_on_all_nodes(name: str, db: AsyncSession) -> list:
+    """Delete a user from all nodes (even unhealthy ones to cleanup).
     
-    return results
+    Healthy nodes are tried right away within NODE_DELETE_DEADLINE, the rest
+    stay queued in the outbox and are retried in the background.
+    """
+    return await SyncService(db).delete_user_from_all_nodes(name)
@@ -2,6 +2,8 @@ import pexpect
 import re
 
 from backend.logger import logger
+from backend.metrics import SCRIPT_SECONDS
+from backend.node.profile_cache import profile_cache
 from backend.schema._input import SettingsUpdate
 
 
@@ -49,6 +51,8 @@ def change_config(request: SettingsUpdate) -> bool:
             file.write(template)
 
         restart_openvpn()
+        # Profiles embed the tunnel address, port and protocol
+        profile_cache.clear()
         logger.info(
             f"OpenVPN port changed to {request.port}, protocol to {request.protocol}, and tunnel address to {request.tunnel_address}"
         )
@@ -58,6 +62,7 @@ def change_config(request: SettingsUpdate) -> bool:
         return False
 
 
+@SCRIPT_SECONDS.labels("restart_openvpn").time()
 def restart_openvpn() -> None:
     """Restart the OpenVPN service with systemctl"""
     try:
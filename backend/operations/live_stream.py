@@ -0,0 +1,157 @@
+"""Server-Sent Events stream of panel state for dashboards.
+
+A single producer builds the dashboard state (node status, sync progress
+and server metrics) every LIVE_STREAM_INTERVAL seconds while at least one
+client is connected, and broadcasts only what changed since the previous
+round. Each client gets a bounded queue: a client that falls
+LIVE_STREAM_QUEUE_SIZE events behind has its backlog replaced by one full
+snapshot, so slow clients never hold memory or slow down the producer.
+
+Events:
+    snapshot: full state {"nodes": {...}, "server": {...}, "sync": {...}},
+        nodes keyed by node id
+    delta: per section {"changed": {key: value}, "removed": [key]}
+"""
+
+from typing import AsyncIterator, Dict, Optional, Set
+import asyncio
+import json
+
+from backend.config import config
+from backend.db.engine import asyncSessionLocal
+from backend.logger import logger
+from backend.node.outbox import OutboxService
+from backend.node.status_snapshot import status_snapshot
+from backend.operations.server_info import server_sampler
+
+
+def _encode(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _diff(old: dict, new: dict) -> Optional[dict]:
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    removed = [key for key in old if key not in new]
+    if not changed and not removed:
+        return None
+    return {"changed": changed, "removed": removed}
+
+
+class LiveSubscriber:
+    """Bounded queue of encoded events for one connected client."""
+
+    def __init__(self, size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.resyncs = 0
+
+
+class LiveStream:
+    """Single producer broadcasting state deltas to all subscribers."""
+
+    def __init__(self):
+        self._subscribers: Set[LiveSubscriber] = set()
+        self._producer: Optional[asyncio.Task] = None
+        self._state: Dict[str, dict] = {}
+        self._snapshot: Optional[str] = None
+        self.rounds = 0
+
+    def _snapshot_event(self) -> str:
+        if self._snapshot is None:
+            self._snapshot = _encode("snapshot", self._state)
+        return self._snapshot
+
+    def _send(self, subscriber: LiveSubscriber, event: str) -> None:
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog, the snapshot supersedes it
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(self._snapshot_event())
+            subscriber.resyncs += 1
+
+    def subscribe(self) -> LiveSubscriber:
+        subscriber = LiveSubscriber(config.LIVE_STREAM_QUEUE_SIZE)
+        self._subscribers.add(subscriber)
+        # Before the first round, that round's delta carries the full state
+        if self._state:
+            self._send(subscriber, self._snapshot_event())
+        if self._producer is None:
+            self._producer = asyncio.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: LiveSubscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    async def _collect(self) -> Dict[str, dict]:
+        async with asyncSessionLocal() as db:
+            nodes = await status_snapshot.get_nodes(db)
+            outbox = await OutboxService(db).stats()
+
+        return {
+            # Nodes on one host differ only by port, the id is unique
+            "nodes": {node["id"]: node for node in nodes},
+            "server": await server_sampler.latest(),
+            "sync": {**outbox["depth"], "lag_seconds": outbox["lag_seconds"]},
+        }
+
+    async def _round(self) -> None:
+        state = await self._collect()
+        delta = {}
+        for section, values in state.items():
+            changes = _diff(self._state.get(section, {}), values)
+            if changes:
+                delta[section] = changes
+
+        self._state = state
+        self._snapshot = None
+        self.rounds += 1
+        if not delta:
+            return
+
+        event = _encode("delta", delta)
+        for subscriber in list(self._subscribers):
+            self._send(subscriber, event)
+
+    async def _run(self) -> None:
+        try:
+            while self._subscribers:
+                try:
+                    await self._round()
+                except Exception as e:
+                    logger.error(f"Error building live stream state: {e}")
+                await asyncio.sleep(config.LIVE_STREAM_INTERVAL)
+        finally:
+            # Stale once nobody watches, the next producer starts over
+            self._producer = None
+            self._state = {}
+            self._snapshot = None
+
+    async def events(self) -> AsyncIterator[str]:
+        """Encoded events for one client, until it disconnects."""
+        subscriber = self.subscribe()
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=config.LIVE_STREAM_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "rounds": self.rounds,
+            "resyncs": sum(subscriber.resyncs for subscriber in self._subscribers),
+            "backlog": max(
+                (subscriber.queue.qsize() for subscriber in self._subscribers),
+                default=0,
+            ),
+        }
+
+
+# Global stream instance
+live_stream = LiveStream()
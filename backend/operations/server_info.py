@@ -1,27 +1,108 @@
-import psutil
+"""Server metrics, sampled in the background.
+
+A scheduler job samples CPU, memory, disk, network and load every
+SERVER_SAMPLE_INTERVAL seconds into a ring buffer of SERVER_SAMPLE_HISTORY
+samples. Requests read the latest sample instead of measuring, so they
+never block the event loop.
+"""
+
+from collections import deque
+from typing import Deque, List, Optional
+import asyncio
+import os
 import time
+
+import psutil
 from fastapi import HTTPException
 
+from backend.config import config
 from backend.logger import logger
-from backend.schema.output import ServerInfo, ResponseModel
+from backend.schema.output import ServerInfo
+
+
+class ServerSampler:
+    """Ring buffer of periodic server metric samples."""
+
+    def __init__(self, size: int):
+        self._samples: Deque[dict] = deque(maxlen=size)
+        self._last_net = None
+        # Prime the counters, the first reading covers the time since here
+        psutil.cpu_percent(interval=None)
+
+    def _read(self) -> dict:
+        now = time.time()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage("/")
+        net = psutil.net_io_counters()
+        load = (
+            [round(value, 2) for value in os.getloadavg()]
+            if hasattr(os, "getloadavg")
+            else [None, None, None]
+        )
+
+        sent_rate = recv_rate = None
+        if self._last_net is not None:
+            last_at, last_net = self._last_net
+            elapsed = now - last_at
+            if elapsed > 0:
+                sent_rate = round((net.bytes_sent - last_net.bytes_sent) / elapsed, 1)
+                recv_rate = round((net.bytes_recv - last_net.bytes_recv) / elapsed, 1)
+        self._last_net = (now, net)
+
+        return {
+            "cpu": psutil.cpu_percent(interval=None),
+            "memory_total": memory.total,
+            "memory_used": memory.used,
+            "memory_percent": memory.percent,
+            "disk_total": disk.total,
+            "disk_used": disk.used,
+            "disk_percent": disk.percent,
+            "uptime": int(now - psutil.boot_time()),
+            "load_1": load[0],
+            "load_5": load[1],
+            "load_15": load[2],
+            "net_sent_rate": sent_rate,
+            "net_recv_rate": recv_rate,
+            "sampled_at": round(now, 3),
+        }
+
+    async def sample(self) -> dict:
+        """Take one sample off the event loop and keep it."""
+        try:
+            sample = await asyncio.to_thread(self._read)
+        except Exception as e:
+            logger.error(f"error when sampling server info: {e}")
+            raise
+        self._samples.append(sample)
+        return sample
+
+    async def latest(self) -> dict:
+        """The newest sample, taken now if none was recorded yet.
+
+        Failed samples are not recorded, so this is the last good one.
+        """
+        if not self._samples:
+            return await self.sample()
+        return self._samples[-1]
+
+    def history(self, since: Optional[float] = None) -> List[dict]:
+        """Recorded samples, oldest first, optionally from a unix time on."""
+        if since is None:
+            return list(self._samples)
+        return [sample for sample in self._samples if sample["sampled_at"] >= since]
+
+
+# Global sampler instance
+server_sampler = ServerSampler(size=config.SERVER_SAMPLE_HISTORY)
 
 
 async def get_server_info() -> ServerInfo:
     try:
-        return ServerInfo(
-            cpu=psutil.cpu_percent(interval=0.5),
-            memory_total=psutil.virtual_memory().total,
-            memory_used=psutil.virtual_memory().used,
-            memory_percent=psutil.virtual_memory().percent,
-            disk_total=psutil.disk_usage("/").total,
-            disk_used=psutil.disk_usage("/").used,
-            disk_percent=psutil.disk_usage("/").percent,
-            uptime=int(time.time() - psutil.boot_time()),
-        )
-    except Exception as e:
-        logger.error(f"error when get server info: {e}")
-        return ResponseModel(
-            success=False,
-            msg="error when get server info, please check the logs",
-            data=None,
+        sample = await server_sampler.latest()
+    except Exception:
+        # Nothing sampled yet and sampling now failed, already logged
+        raise HTTPException(
+            status_code=503,
+            detail="server info is not available yet, please check the logs",
         )
+    return ServerInfo(**sample)
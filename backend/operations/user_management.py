@@ -3,11 +3,13 @@ import re
 import os
 
 from backend.logger import logger
+from backend.metrics import SCRIPT_SECONDS
 
 
 script_path = "/root/openvpn-install.sh"
 
 
+@SCRIPT_SECONDS.labels("create_user").time()
 def create_user_on_server(name, expiry_date) -> bool:
     try:
         if not os.path.exists(script_path):
@@ -44,6 +46,7 @@ def create_user_on_server(name, expiry_date) -> bool:
         return False
 
 
+@SCRIPT_SECONDS.labels("delete_user").time()
 def delete_user_on_server(name) -> bool | str:
     try:
         if not os.path.exists(script_path):
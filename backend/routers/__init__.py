@@ -3,6 +3,8 @@ from .users import router as user_router
 from .admins import router as admin_router
 from .node import router as node_router
 from .setting import router as setting_router
+from .live import router as live_router
+from .metrics import router as metrics_router
 
 all_routers = [
     login_router,
@@ -10,4 +12,6 @@ all_routers = [
     setting_router,
     node_router,
     admin_router,
+    live_router,
+    metrics_router,
 ]
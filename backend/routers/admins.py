@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from backend.db.engine import get_db
-from backend.db import crud
+from backend.db.engine import get_async_db
+from backend.db import async_crud
 from backend.schema.output import Admins, ResponseModel
 from backend.auth.auth import verify_jwt_or_api_key
 
@@ -13,9 +13,9 @@ router = APIRouter(prefix="/admin", tags=["Admins"])
 
 @router.get("/all", response_model=ResponseModel)
 async def get_all_admins(
-    db: Session = Depends(get_db), auth: dict = Depends(verify_jwt_or_api_key)
+    db: AsyncSession = Depends(get_async_db), auth: dict = Depends(verify_jwt_or_api_key)
 ):
-    result = crud.get_all_admins(db)
+    result = await async_crud.get_all_admins(db)
     return ResponseModel(
         success=True,
         msg="Admins retrieved successfully",
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from backend.auth.auth import verify_jwt_or_api_key
+from backend.operations.live_stream import live_stream
+from backend.schema.output import ResponseModel
+
+router = APIRouter(prefix="/live", tags=["Live"])
+
+
+@router.get(
+    "/stream",
+    description="Server-Sent Events of node status, sync progress and server metrics",
+)
+async def stream_live_state(auth: dict = Depends(verify_jwt_or_api_key)):
+    return StreamingResponse(
+        live_stream.events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/status", response_model=ResponseModel)
+async def get_live_stream_status(auth: dict = Depends(verify_jwt_or_api_key)):
+    return ResponseModel(
+        success=True,
+        msg="Live stream status retrieved",
+        data=live_stream.stats(),
+    )
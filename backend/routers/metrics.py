@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+
+from backend.auth.auth import verify_api_key
+from backend.metrics import render
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get(
+    "/metrics",
+    description="Prometheus metrics, requires the API key in the key header",
+)
+async def get_metrics(auth: dict = Depends(verify_api_key)):
+    content, content_type = render()
+    return Response(content=content, media_type=content_type)
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+from datetime import datetime, timedelta
+import hmac
 
 from backend.auth.auth import verify_jwt_or_api_key
-from backend.db.engine import get_db
+from backend.db.engine import get_async_db
 from backend.schema.output import ResponseModel
-from backend.schema._input import NodeCreate
+from backend.schema._input import NodeCreate, NodeHeartbeat
 from backend.node.task import (
     add_node_handler,
     update_node_handler,
@@ -17,6 +20,7 @@ from backend.node.task import (
 )
 from backend.node.health_check import HealthCheckService
 from backend.node.sync import SyncService
+from backend.node.outbox import OutboxService
 from backend.logger import logger
 
 router = APIRouter(prefix="/node", tags=["Nodes"])
@@ -25,7 +29,7 @@ router = APIRouter(prefix="/node", tags=["Nodes"])
 @router.post("/add", response_model=ResponseModel)
 async def add_node(
     request: NodeCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Add a new node and automatically sync all existing users to it."""
@@ -57,10 +61,11 @@ async def add_node(
 async def update_node(
     address: str,
     request: NodeCreate,
-    db: Session = Depends(get_db),
+    port: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
-    result = await update_node_handler(address, request, db)
+    result = await update_node_handler(address, request, db, port)
     return ResponseModel(
         success=result,
         msg="Node updated successfully" if result else "Failed to update node",
@@ -70,10 +75,11 @@ async def update_node(
 @router.get("/status/{address}", response_model=ResponseModel)
 async def get_node_status(
     address: str,
-    db: Session = Depends(get_db),
+    port: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
-    node_status = await get_node_status_handler(address, db)
+    node_status = await get_node_status_handler(address, db, port)
     return ResponseModel(
         success=True,
         msg="Node status retrieved successfully",
@@ -83,7 +89,7 @@ async def get_node_status(
 
 @router.get("/list", response_model=ResponseModel)
 async def list_nodes(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Get all nodes with their cached health status.
@@ -100,73 +106,40 @@ async def list_nodes(
     )
 
 
+@router.get(
+    "/export",
+    description="Stream every node, without its key, as NDJSON (one object per line) or CSV",
+)
+async def export_nodes(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    from backend.operations.export import MEDIA_TYPES, NODE_COLUMNS, export_rows
+
+    return StreamingResponse(
+        export_rows(NODE_COLUMNS, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="nodes.{format}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @router.get("/list/with-status", response_model=ResponseModel)
 async def list_nodes_with_live_status(
-    db: Session = Depends(get_db),
+    fresh: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Get all nodes with their live status including CPU and memory usage.
     
-    This endpoint fetches real-time status from each node.
-    Use this for dashboard/monitoring views.
+    Served from the shared status snapshot kept up to date by the health
+    probes. Use ?fresh=1 to query every active node before responding.
     """
-    from backend.db import crud
-    from backend.node.requests import NodeRequests
-    import asyncio
+    from backend.node.status_snapshot import status_snapshot
     
-    all_nodes = crud.get_all_nodes(db)
-    
-    async def fetch_node_status(node):
-        """Fetch live status for a single node."""
-        node_info = {
-            "name": node.name,
-            "address": node.address,
-            "tunnel_address": node.tunnel_address,
-            "ovpn_port": node.ovpn_port,
-            "protocol": node.protocol,
-            "port": node.port,
-            "status": "offline",
-            "is_healthy": False,
-            "cpu_usage": None,
-            "memory_usage": None,
-            "node_status": None,
-            "response_time": None,
-            "last_health_check": str(node.last_health_check) if node.last_health_check else None,
-        }
-        
-        # Only check if node is marked as active
-        if node.status:
-            try:
-                node_request = NodeRequests(
-                    address=node.address,
-                    port=node.port,
-                    api_key=node.key,
-                    tunnel_addres=node.tunnel_address or "ovpanel.com",
-                    protocol=node.protocol,
-                    ovpn_port=node.ovpn_port,
-                    timeout=3,  # Quick timeout
-                    max_retries=0,  # No retries for speed
-                )
-                
-                # Get live node info
-                live_data = await node_request.get_node_info_async()
-                
-                if live_data:
-                    node_info.update({
-                        "status": "online",
-                        "is_healthy": True,
-                        "cpu_usage": live_data.get("cpu_usage"),
-                        "memory_usage": live_data.get("memory_usage"),
-                        "node_status": live_data.get("status"),
-                        "response_time": round(live_data.get("response_time", 0), 3) if live_data.get("response_time") else None,
-                    })
-            except Exception as e:
-                logger.warning(f"Failed to get live status for node {node.address}: {e}")
-        
-        return node_info
-    
-    # Fetch all node statuses concurrently
-    nodes_with_status = await asyncio.gather(*[fetch_node_status(node) for node in all_nodes])
+    nodes_with_status = await status_snapshot.get_nodes(db, fresh=fresh)
     
     # Calculate summary stats
     online_count = sum(1 for n in nodes_with_status if n["status"] == "online")
@@ -188,13 +161,13 @@ async def list_nodes_with_live_status(
 
 @router.get("/list/healthy", response_model=ResponseModel)
 async def list_healthy_nodes(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Get only healthy and active nodes for download selection."""
-    from backend.db import crud
+    from backend.db import async_crud
     
-    all_nodes = crud.get_all_nodes(db)
+    all_nodes = await async_crud.get_all_nodes(db)
     healthy_nodes = [
         {
             "name": node.name,
@@ -219,19 +192,25 @@ async def list_healthy_nodes(
 async def download_ovpn_client(
     address: str,
     name: str,
-    db: Session = Depends(get_db),
+    port: Optional[int] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Download OVPN from specific node with health validation."""
     response = await download_ovpn_client_from_node(
-        name=name, node_address=address, db=db
+        name=name,
+        node_address=address,
+        db=db,
+        if_none_match=if_none_match,
+        node_port=port,
     )
     if response:
         return response
     else:
         # Get node to provide better error message
-        from backend.db import crud
-        node = crud.get_node_by_address(db, address)
+        from backend.db import async_crud
+        node = await async_crud.get_node_by_address(db, address, port)
         
         if not node:
             raise HTTPException(status_code=404, detail="Node not found")
@@ -255,11 +234,18 @@ async def download_ovpn_client(
 )
 async def download_ovpn_from_best(
     name: str,
-    db: Session = Depends(get_db),
+    hedge: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
-    """Download OVPN from the best performing healthy node."""
-    response = await download_ovpn_from_best_node(name=name, db=db)
+    """Download OVPN from the best performing healthy node, failing over to others.
+    
+    Pass hedge=true to race a second node when the first one is slow.
+    """
+    response = await download_ovpn_from_best_node(
+        name=name, db=db, if_none_match=if_none_match, hedge=hedge
+    )
     if response:
         return response
     else:
@@ -272,20 +258,46 @@ async def download_ovpn_from_best(
 @router.delete("/delete/{address}", response_model=ResponseModel)
 async def delete_node(
     address: str,
-    db: Session = Depends(get_db),
+    port: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
-    result = await delete_node_handler(address, db)
+    result = await delete_node_handler(address, db, port)
     return ResponseModel(
         success=result,
         msg="Node deleted successfully" if result else "Failed to delete node",
     )
 
 
+# Heartbeat Endpoints
+@router.post("/heartbeat", response_model=ResponseModel)
+async def node_heartbeat(
+    heartbeat: NodeHeartbeat,
+    key: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Receive a status heartbeat from a node, authenticated by its own key."""
+    from backend.db import async_crud
+    from backend.node.heartbeat import node_heartbeats
+    
+    node = await async_crud.get_node_by_address_and_port(
+        db, heartbeat.address, heartbeat.port
+    )
+    if not node or not key or not hmac.compare_digest(key.encode(), node.key.encode()):
+        raise HTTPException(status_code=401, detail="Invalid node credentials")
+    
+    result = await node_heartbeats.ingest(db, node, heartbeat)
+    return ResponseModel(
+        success=True,
+        msg="Heartbeat received",
+        data=result,
+    )
+
+
 # Health Check Endpoints
 @router.post("/health-check/all", response_model=ResponseModel)
 async def health_check_all_nodes(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Run health check on all nodes."""
@@ -304,13 +316,14 @@ async def health_check_all_nodes(
 @router.post("/health-check/{address}", response_model=ResponseModel)
 async def health_check_node(
     address: str,
-    db: Session = Depends(get_db),
+    port: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Run health check on a specific node."""
-    from backend.db import crud
+    from backend.db import async_crud
     
-    node = crud.get_node_by_address(db, address)
+    node = await async_crud.get_node_by_address(db, address, port)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     
@@ -326,7 +339,7 @@ async def health_check_node(
 
 @router.post("/recover", response_model=ResponseModel)
 async def recover_nodes(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Attempt to recover unhealthy nodes."""
@@ -340,10 +353,57 @@ async def recover_nodes(
     )
 
 
+@router.get("/health-history", response_model=ResponseModel)
+async def get_health_history(
+    address: Optional[str] = None,
+    port: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    """Get latency percentiles (p50/p95/p99) and uptime per node over a window.
+    
+    The window defaults to the last 24 hours; pass address (and port when
+    nodes share it) to get one node.
+    """
+    from backend.db import async_crud
+    from backend.node.health_history import health_history
+    
+    end = end or datetime.now()
+    start = start or end - timedelta(hours=24)
+    # Buckets are stored in local time
+    start, end = [
+        t.astimezone().replace(tzinfo=None) if t.tzinfo else t for t in (start, end)
+    ]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    nodes = {node.id: node for node in await async_crud.get_all_nodes(db)}
+    node_id = None
+    if address:
+        node = await async_crud.get_node_by_address(db, address, port)
+        if not node:
+            raise HTTPException(status_code=404, detail="Node not found")
+        node_id = node.id
+    
+    results = await async_crud.run(db, health_history.query, start, end, node_id)
+    for result in results:
+        node = nodes.get(result["node_id"])
+        result["name"] = node.name if node else None
+        result["address"] = node.address if node else None
+    
+    return ResponseModel(
+        success=True,
+        msg="Health history retrieved",
+        data={"start": str(start), "end": str(end), "nodes": results},
+    )
+
+
 # Sync Endpoints
 @router.post("/sync/all", response_model=ResponseModel)
 async def sync_all_nodes(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Synchronize all users to all healthy nodes."""
@@ -362,7 +422,7 @@ async def sync_all_nodes(
 
 @router.post("/sync/pending", response_model=ResponseModel)
 async def sync_pending_nodes(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Synchronize only nodes with pending sync status."""
@@ -379,13 +439,14 @@ async def sync_pending_nodes(
 @router.post("/sync/{address}", response_model=ResponseModel)
 async def sync_single_node(
     address: str,
-    db: Session = Depends(get_db),
+    port: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
     """Synchronize all users to a specific node."""
-    from backend.db import crud
+    from backend.db import async_crud
     
-    node = crud.get_node_by_address(db, address)
+    node = await async_crud.get_node_by_address(db, address, port)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     
@@ -405,13 +466,97 @@ async def sync_single_node(
     )
 
 
+# Ranking Endpoints
+@router.get("/ranking", response_model=ResponseModel)
+async def get_node_ranking(
+    db: AsyncSession = Depends(get_async_db),
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    """Get the download weights of nodes and the signals behind them."""
+    from backend.db import async_crud
+    from backend.node.ranking import node_ranking
+    
+    nodes = {node.id: node for node in await async_crud.get_all_nodes(db)}
+    ranking = node_ranking.snapshot()
+    for entry in ranking:
+        node = nodes.get(entry["node_id"])
+        entry["address"] = node.address if node else None
+    
+    return ResponseModel(
+        success=True,
+        msg="Node ranking retrieved",
+        data=ranking,
+    )
+
+
+# Fanout Endpoints
+@router.get("/fanout/status", response_model=ResponseModel)
+async def get_fanout_status(
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    """Get in-flight and queued node requests, with wait times per priority."""
+    from backend.node.fanout import fanout
+    
+    return ResponseModel(
+        success=True,
+        msg="Fan-out status retrieved",
+        data=fanout.stats(),
+    )
+
+
+# Outbox Endpoints
+@router.get("/outbox/status", response_model=ResponseModel)
+async def get_outbox_status(
+    db: AsyncSession = Depends(get_async_db),
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    """Get queue depth and lag of pending node operations."""
+    stats = await OutboxService(db).stats()
+    return ResponseModel(
+        success=True,
+        msg="Outbox status retrieved",
+        data=stats,
+    )
+
+
+@router.get("/outbox/dead", response_model=ResponseModel)
+async def get_outbox_dead_letters(
+    db: AsyncSession = Depends(get_async_db),
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    """List node operations that exhausted their retries."""
+    dead = await OutboxService(db).dead_letters()
+    return ResponseModel(
+        success=True,
+        msg=f"Found {len(dead)} dead-lettered operations",
+        data=dead,
+    )
+
+
+@router.post("/outbox/retry-dead", response_model=ResponseModel)
+async def retry_outbox_dead_letters(
+    db: AsyncSession = Depends(get_async_db),
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    """Requeue all dead-lettered node operations."""
+    from backend.db import async_crud
+    
+    count = await async_crud.requeue_dead_node_operations(db)
+    return ResponseModel(
+        success=True,
+        msg=f"Requeued {count} operations",
+        data=count,
+    )
+
+
 # Scheduler Management Endpoints
 @router.get("/scheduler/status", response_model=ResponseModel)
 async def get_scheduler_status(
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
-    """Get scheduler status and scheduled jobs."""
+    """Get scheduler status, scheduled jobs, probe schedules and circuit breakers."""
     from backend.node.scheduler import scheduler
+    from backend.node.circuit_breaker import breaker_states
     
     jobs = scheduler.get_jobs()
     
@@ -421,5 +566,7 @@ async def get_scheduler_status(
         data={
             "is_running": scheduler.is_running,
             "jobs": jobs,
+            "health_probes": scheduler.probes.get_states(),
+            "circuit_breakers": breaker_states(),
         },
     )
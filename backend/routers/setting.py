@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+import time
 
-from backend.db.engine import get_db
-from backend.db import crud
+from backend.db.engine import get_async_db
+from backend.db import async_crud
 from backend.auth.auth import verify_jwt_or_api_key
-from backend.operations.server_info import get_server_info
+from backend.operations.server_info import get_server_info, server_sampler
 from backend.schema._input import SettingsUpdate
 from backend.schema.output import Settings, ServerInfo, ResponseModel
 from backend.operations.core_setting import change_config
@@ -14,9 +15,9 @@ router = APIRouter(prefix="/settings", tags=["Panel Settings"])
 
 @router.get("/", response_model=ResponseModel)
 async def get_settings(
-    db: Session = Depends(get_db), auth: dict = Depends(verify_jwt_or_api_key)
+    db: AsyncSession = Depends(get_async_db), auth: dict = Depends(verify_jwt_or_api_key)
 ):
-    settings = crud.get_settings(db)
+    settings = await async_crud.get_settings(db)
     return ResponseModel(
         success=True,
         msg="Settings retrieved successfully",
@@ -27,10 +28,10 @@ async def get_settings(
 @router.put("/update", response_model=ResponseModel)
 async def update_settings(
     request: SettingsUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
-    update = crud.update_settings(db, request)
+    update = await async_crud.update_settings(db, request)
     if update:
         set_new_conf = change_config(request)
         if not set_new_conf:
@@ -50,3 +51,20 @@ async def get_server_information(auth: dict = Depends(verify_jwt_or_api_key)):
         msg="Server information retrieved successfully",
         data=ServerInfo.from_orm(result),
     )
+
+
+@router.get(
+    "/server/history",
+    response_model=ResponseModel,
+    description="Get recent server information samples for charts, oldest first",
+)
+async def get_server_history(
+    seconds: int = Query(default=900, ge=1),
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    samples = server_sampler.history(since=time.time() - seconds)
+    return ResponseModel(
+        success=True,
+        msg="Server history retrieved successfully",
+        data=samples,
+    )
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.schema.output import ResponseModel, Users
-from backend.schema._input import CreateUser, UpdateUser
-from backend.db.engine import get_db
-from backend.db import crud
+from backend.schema._input import CreateUser, UpdateUser, UserFilter
+from backend.db.engine import get_async_db
+from backend.db import async_crud
 from backend.operations.user_management import (
     create_user_on_server,
     delete_user_on_server,
@@ -16,15 +18,17 @@ from backend.node.task import (
     create_user_on_all_nodes,
     delete_user_on_all_nodes,
 )
+from backend.node.profile_cache import profile_cache
+from backend.operations.export import MEDIA_TYPES, USER_COLUMNS, export_rows
 
 router = APIRouter(prefix="/user", tags=["Users"])
 
 
 @router.get("/all", response_model=ResponseModel)
 async def get_all_users(
-    db: Session = Depends(get_db), auth: dict = Depends(verify_jwt_or_api_key)
+    db: AsyncSession = Depends(get_async_db), auth: dict = Depends(verify_jwt_or_api_key)
 ):
-    all_users = crud.get_all_users(db)
+    all_users = await async_crud.get_all_users(db)
     users_list = [Users.from_orm(user) for user in all_users]
     return ResponseModel(
         success=True,
@@ -33,6 +37,66 @@ async def get_all_users(
     )
 
 
+@router.get("/page", response_model=ResponseModel)
+async def get_users_page(
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: Literal["name", "expiry_date"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    is_active: Optional[bool] = None,
+    owner: Optional[str] = None,
+    expiring_in_days: Optional[int] = Query(default=None, ge=0),
+    search: Optional[str] = None,
+    match: Literal["prefix", "contains"] = "prefix",
+    db: AsyncSession = Depends(get_async_db),
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    """Get a page of users with the counts of all users matching the filters.
+
+    Pass the next_cursor of a page as cursor to get the following page, with
+    the same sort, order and filters; it is null on the last page. search
+    matches names case-insensitively, by prefix or anywhere in the name.
+    """
+    filters = UserFilter(
+        is_active=is_active,
+        owner=owner,
+        expiring_in_days=expiring_in_days,
+        search=search,
+        match=match,
+    )
+    users, next_cursor = await async_crud.get_users_page(
+        db, filters, limit, sort, order == "desc", cursor
+    )
+    counts = await async_crud.count_users(db, filters)
+    return ResponseModel(
+        success=True,
+        msg="Users retrieved successfully",
+        data={
+            "users": [Users.from_orm(user) for user in users],
+            "next_cursor": next_cursor,
+            **counts,
+        },
+    )
+
+
+@router.get(
+    "/export",
+    description="Stream every user as NDJSON (one object per line) or CSV",
+)
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    auth: dict = Depends(verify_jwt_or_api_key),
+):
+    return StreamingResponse(
+        export_rows(USER_COLUMNS, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="users.{format}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @router.get("/download/ovpn/{name}")
 async def download_ovpn(
     name: str,
@@ -52,10 +116,10 @@ async def download_ovpn(
 @router.post("/create", response_model=ResponseModel)
 async def create_user(
     request: CreateUser,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
-    check_user = crud.get_user_by_name(db, request.name)
+    check_user = await async_crud.get_user_by_name(db, request.name)
     if check_user is not None:
         return ResponseModel(
             success=False, msg="User with this name already exists", data=None
@@ -67,8 +131,8 @@ async def create_user(
             success=False, msg="Server error while creating user", data=None
         )
 
+    await async_crud.create_user(db, request, "owner")
     await create_user_on_all_nodes(request.name, db)
-    crud.create_user(db, request, "owner")
     return ResponseModel(
         success=True, msg="User created successfully", data=request.name
     )
@@ -77,21 +141,26 @@ async def create_user(
 @router.put("/update")
 async def update_user(
     request: UpdateUser,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     auth: dict = Depends(verify_jwt_or_api_key),
 ):
-    result = crud.update_user(db, request)
+    result = await async_crud.update_user(db, request)
     return ResponseModel(success=True, msg="User updated successfully", data=result)
 
 
 @router.delete("/delete/{name}")
 async def delete_user(
-    name: str, db: Session = Depends(get_db), auth: dict = Depends(verify_jwt_or_api_key)
+    name: str, db: AsyncSession = Depends(get_async_db), auth: dict = Depends(verify_jwt_or_api_key)
 ):
     server_result = delete_user_on_server(name)
     if server_result == "not_found":
         return ResponseModel(success=False, msg="User not found on server", data=None)
 
-    await delete_user_on_all_nodes(name, db)
-    db_result = crud.delete_user(db, name)
-    return ResponseModel(success=True, msg="User deleted successfully", data=db_result)
+    node_results = await delete_user_on_all_nodes(name, db)
+    profile_cache.invalidate_user(name)
+    db_result = await async_crud.delete_user(db, name)
+    return ResponseModel(
+        success=True,
+        msg="User deleted successfully",
+        data={**db_result, "nodes": node_results},
+    )
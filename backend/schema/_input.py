@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date
-from typing import Optional
+from typing import Literal, Optional
 
 
 class CreateUser(BaseModel):
@@ -14,6 +14,14 @@ class UpdateUser(BaseModel):
     expiry_date: Optional[date]
 
 
+class UserFilter(BaseModel):
+    is_active: Optional[bool] = None
+    owner: Optional[str] = None
+    expiring_in_days: Optional[int] = None  # expiring between today and then
+    search: Optional[str] = None  # in user names
+    match: Literal["prefix", "contains"] = "prefix"
+
+
 class NodeCreate(BaseModel):
     name: str = Field(max_length=10)
     address: str
@@ -26,6 +34,17 @@ class NodeCreate(BaseModel):
     set_new_setting: bool = Field(default=False)
 
 
+class NodeHeartbeat(BaseModel):
+    address: str  # as registered in the panel
+    port: int  # with the address, identifies the node
+    status: str = Field(default="running")
+    cpu_usage: Optional[float] = Field(default=None, ge=0, le=100)
+    memory_usage: Optional[float] = Field(default=None, ge=0, le=100)
+    clients: Optional[int] = Field(default=None, ge=0)
+    # sha256 hex of the node's user names, sorted and joined by newlines
+    users_digest: Optional[str] = Field(default=None, max_length=64)
+
+
 class SettingsUpdate(BaseModel):
     tunnel_address: Optional[str] = None
     port: Optional[int]
@@ -28,6 +28,12 @@ class ServerInfo(BaseModel):
     disk_used: int
     disk_percent: float
     uptime: int
+    load_1: Optional[float] = None
+    load_5: Optional[float] = None
+    load_15: Optional[float] = None
+    net_sent_rate: Optional[float] = None  # in bytes per second
+    net_recv_rate: Optional[float] = None  # in bytes per second
+    sampled_at: Optional[float] = None  # unix time
 
     class Config:
         from_attributes = True
@@ -0,0 +1,108 @@
+"""Benchmark API latency under concurrent load while a health sweep runs.
+
+Serves the panel in-process on a scratch SQLite database seeded with users
+and nodes, all pointing at the local fake node. Concurrent clients hit
+read endpoints first on an idle panel, then while health sweeps of every
+node run back to back, and p50/p99 latency is reported for both phases.
+
+Usage (from the repository root):
+    python -m benchmarks.api_latency --nodes 200 --users 2000 --clients 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks import fake_node, scratch_db
+from backend.app import api
+from backend.config import config
+from backend.db.engine import asyncSessionLocal
+from backend.node.health_check import HealthCheckService
+from backend.node.requests import close_clients
+
+
+ENDPOINTS = ["/api/node/list", "/api/node/list/healthy", "/api/admin/all"]
+
+
+async def _load(client: httpx.AsyncClient, clients: int, seconds: float) -> list:
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def worker(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(ENDPOINTS[i % len(ENDPOINTS)])
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+            i += 1
+
+    await asyncio.gather(*[worker(i) for i in range(clients)])
+    return latencies
+
+
+async def _sweeps(stop: asyncio.Event) -> int:
+    count = 0
+    while not stop.is_set():
+        async with asyncSessionLocal() as db:
+            await HealthCheckService(db).check_all_nodes()
+        count += 1
+    return count
+
+
+def _report(phase: str, latencies: list, seconds: float) -> None:
+    cuts = statistics.quantiles(latencies, n=100)
+    print(
+        f"{phase:<12} {len(latencies) / seconds:>8.0f} {cuts[49] * 1000:>9.1f}"
+        f" {cuts[98] * 1000:>9.1f} {max(latencies) * 1000:>9.1f}"
+    )
+
+
+async def main(args):
+    config.API_KEY = "benchmark-key"
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://panel", headers={"key": config.API_KEY}
+    ) as client:
+        # Warm up connections and caches
+        await _load(client, args.clients, 1)
+
+        print(f"{'phase':<12} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        _report("idle", await _load(client, args.clients, args.seconds), args.seconds)
+
+        stop = asyncio.Event()
+        sweeps = asyncio.create_task(_sweeps(stop))
+        latencies = await _load(client, args.clients, args.seconds)
+        stop.set()
+        count = await sweeps
+        _report("health sweep", latencies, args.seconds)
+        print(f"{count} sweeps of {args.nodes} nodes during the run")
+    await close_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=50, help="concurrent API clients")
+    parser.add_argument("--seconds", type=float, default=10, help="duration per phase")
+    parser.add_argument("--port", type=int, default=18766)
+    parser.add_argument(
+        "--latency", type=float, default=20, help="emulated node RTT in ms"
+    )
+    args = parser.parse_args()
+
+    server = fake_node.start(args.port, args.latency / 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch_db.use_database(Path(tmp) / "benchmark.db")
+        scratch_db.seed(args.nodes, args.users, args.port)
+        time.sleep(0.5)
+        try:
+            asyncio.run(main(args))
+        finally:
+            server.terminate()
@@ -0,0 +1,117 @@
+"""Benchmark SQLite write contention with concurrent readers.
+
+Writer tasks update node health at a fixed total rate (as the probes and
+admin actions do) while reader tasks list nodes and their users. Runs once
+with SQLite's defaults and every writer committing on its own session, as
+the panel did before, and once with the SQLite profile (WAL and pragmas)
+and the single coalescing writer. Reports throughput, p99 latency and lock
+errors.
+
+Usage (from the repository root):
+    python -m benchmarks.db_contention --rate 500 --readers 10 --seconds 10
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks import scratch_db
+from backend.db import async_crud, crud
+from backend.db.engine import asyncSessionLocal
+from backend.db.writer import db_writer
+
+
+def _p99(latencies: list) -> float:
+    if len(latencies) < 2:
+        return max(latencies, default=0) * 1000
+    return statistics.quantiles(latencies, n=100)[98] * 1000
+
+
+async def _run(args, tuned: bool) -> dict:
+    writes, reads, errors = [], [], 0
+    deadline = time.perf_counter() + args.seconds
+
+    async def writer():
+        nonlocal errors
+        interval = args.writers / args.rate
+        await asyncio.sleep(random.uniform(0, interval))
+        async with asyncSessionLocal() as db:
+            while time.perf_counter() < deadline:
+                next_at = time.perf_counter() + interval
+                node_id = random.randint(1, args.nodes)
+                start = time.perf_counter()
+                try:
+                    if tuned:
+                        await async_crud.update_node_health(
+                            db, node_id, True, random.random(), 0
+                        )
+                    else:
+                        await async_crud.run(
+                            db, crud.update_node_health, node_id, True, random.random(), 0
+                        )
+                except OperationalError:
+                    errors += 1
+                    await db.rollback()
+                    continue
+                writes.append(time.perf_counter() - start)
+                await asyncio.sleep(max(next_at - time.perf_counter(), 0))
+
+    async def reader():
+        nonlocal errors
+        async with asyncSessionLocal() as db:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    await async_crud.get_all_nodes(db)
+                    await async_crud.get_node_users(db, random.randint(1, args.nodes))
+                except OperationalError:
+                    errors += 1
+                    await db.rollback()
+                    continue
+                reads.append(time.perf_counter() - start)
+
+    await asyncio.gather(
+        *[writer() for _ in range(args.writers)],
+        *[reader() for _ in range(args.readers)],
+    )
+    return {
+        "writes": len(writes) / args.seconds,
+        "write_p99": _p99(writes),
+        "reads": len(reads) / args.seconds,
+        "read_p99": _p99(reads),
+        "errors": errors,
+    }
+
+
+def main(args):
+    print(
+        f"{'mode':<9} {'writes/s':>9} {'write p99':>10} {'reads/s':>8}"
+        f" {'read p99':>9} {'locked':>7}"
+    )
+    for mode, tuned in (("default", False), ("tuned", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            scratch_db.use_database(Path(tmp) / "benchmark.db", tuned=tuned)
+            scratch_db.seed(args.nodes, 0, 0)
+            result = asyncio.run(_run(args, tuned))
+        print(
+            f"{mode:<9} {result['writes']:>9.0f} {result['write_p99']:>8.1f}ms"
+            f" {result['reads']:>8.0f} {result['read_p99']:>7.1f}ms {result['errors']:>7}"
+        )
+    stats = db_writer.stats()
+    print(f"writer: {stats['writes']} writes in {stats['batches']} transactions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=50, help="concurrent writer tasks")
+    parser.add_argument("--rate", type=float, default=500, help="writes per second offered")
+    parser.add_argument("--readers", type=int, default=10, help="concurrent reader tasks")
+    parser.add_argument("--seconds", type=float, default=10, help="duration per mode")
+    main(parser.parse_args())
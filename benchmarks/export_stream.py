@@ -0,0 +1,119 @@
+"""Benchmark the streaming user export against one in-memory user list.
+
+Seeds a scratch SQLite database with users, then calls the panel's ASGI
+app directly (so body chunks are seen as they are sent) for the NDJSON
+and CSV exports, and builds the single ResponseModel list /user/all
+returns. Reports time to first byte, total time and peak Python memory
+(traced in a second run, tracing slows the first one down).
+
+Usage (from the repository root):
+    python -m benchmarks.export_stream --users 200000
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks import scratch_db
+from backend.app import api
+from backend.config import config
+from backend.db import async_crud
+from backend.db.engine import asyncSessionLocal
+from backend.schema.output import ResponseModel, Users
+
+
+async def _export(path: str, query: str) -> tuple:
+    """Time to first body byte, total time and body size of a GET."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"panel"), (b"key", config.API_KEY.encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("panel", 80),
+    }
+    requested = asyncio.Event()
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+
+    async def receive():
+        if requested.is_set():
+            await asyncio.Event().wait()  # no disconnect
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal first_byte, size
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+        elif message.get("body"):
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(message["body"])
+
+    await api(scope, receive, send)
+    return first_byte, time.perf_counter() - start, size
+
+
+async def _list() -> tuple:
+    """The single response /user/all builds."""
+    start = time.perf_counter()
+    async with asyncSessionLocal() as db:
+        users = await async_crud.get_all_users(db)
+        response = ResponseModel(
+            success=True,
+            msg="Users retrieved successfully",
+            data=[Users.model_validate(user) for user in users],
+        )
+        body = JSONResponse(jsonable_encoder(response)).body
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, len(body)
+
+
+async def _peak(run) -> float:
+    tracemalloc.start()
+    await run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+async def main(args):
+    config.API_KEY = "benchmark-key"
+    runs = {
+        "list": _list,
+        "ndjson": lambda: _export("/api/user/export", "format=ndjson"),
+        "csv": lambda: _export("/api/user/export", "format=csv"),
+    }
+    print(f"{'mode':<7} {'first byte':>11} {'total':>9} {'size MB':>8} {'peak MB':>8}")
+    for mode, run in runs.items():
+        first_byte, total, size = await run()
+        peak = await _peak(run)
+        print(
+            f"{mode:<7} {first_byte * 1000:>9.1f}ms {total * 1000:>7.0f}ms"
+            f" {size / 1024 / 1024:>8.1f} {peak:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch_db.use_database(Path(tmp) / "benchmark.db")
+        scratch_db.seed(0, args.users, 0)
+        asyncio.run(main(args))
@@ -0,0 +1,75 @@
+"""Minimal fake node agent used by the benchmarks.
+
+Answers every request with a successful JSON payload over HTTP/1.1
+keep-alive. It listens on 0.0.0.0 so that each benchmark "node" can be a
+distinct loopback address (127.0.x.y) sharing the same port. ``latency``
+emulates the network round trip of a remote node: it is paid once when a
+connection is opened (the TCP handshake) and once per request.
+"""
+
+import asyncio
+import functools
+import json
+import multiprocessing
+
+
+BODY = json.dumps(
+    {
+        "success": True,
+        "msg": "ok",
+        "data": {"status": "running", "cpu_usage": 1.0, "memory_usage": 1.0},
+    }
+).encode()
+
+
+async def _handle(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, latency: float
+):
+    try:
+        await asyncio.sleep(latency)
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            await asyncio.sleep(latency)
+
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Content-Length: " + str(len(BODY)).encode() + b"\r\n"
+                b"\r\n" + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _serve(port: int, latency: float):
+    handler = functools.partial(_handle, latency=latency)
+    server = await asyncio.start_server(handler, "0.0.0.0", port, backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+
+def run(port: int, latency: float = 0.0):
+    asyncio.run(_serve(port, latency))
+
+
+def start(port: int, latency: float = 0.0) -> multiprocessing.Process:
+    """Start the fake node in a separate process."""
+    process = multiprocessing.Process(
+        target=run, args=(port, latency), daemon=True
+    )
+    process.start()
+    return process
+
+
+def node_address(index: int) -> str:
+    """Return a distinct loopback address for the n-th fake node."""
+    return f"127.0.{index // 250}.{index % 250 + 1}"
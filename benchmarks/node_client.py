@@ -0,0 +1,82 @@
+"""Benchmark the node client against a local fake node.
+
+Compares the legacy path (blocking ``requests`` calls on a 10-worker thread
+pool, a new TCP connection per call) with the pooled asyncio client.
+
+Usage (from the repository root):
+    python -m benchmarks.node_client --nodes 100 500 --requests 10 --latency 20
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import fake_node
+from backend.node.requests import NodeRequests, close_clients
+
+
+def _node_requests(count: int, port: int) -> list:
+    return [
+        NodeRequests(
+            address=fake_node.node_address(i),
+            port=port,
+            api_key="benchmark-key",
+            timeout=10,
+            max_retries=0,
+        )
+        for i in range(count)
+    ]
+
+
+async def bench_legacy(nodes: list, rounds: int) -> float:
+    """Blocking check_node through a 10-worker thread pool."""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=10)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = await asyncio.gather(
+            *[loop.run_in_executor(executor, node.check_node) for node in nodes]
+        )
+        assert all(ok for ok, _ in results)
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+    return len(nodes) * rounds / elapsed
+
+
+async def bench_pooled(nodes: list, rounds: int) -> float:
+    """Native async check_node_async over pooled keep-alive connections."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = await asyncio.gather(*[node.check_node_async() for node in nodes])
+        assert all(ok for ok, _ in results)
+    elapsed = time.perf_counter() - start
+    await close_clients()
+    return len(nodes) * rounds / elapsed
+
+
+async def main(args):
+    print(f"{'nodes':>6} {'legacy req/s':>14} {'pooled req/s':>14} {'speedup':>8}")
+    for count in args.nodes:
+        nodes = _node_requests(count, args.port)
+        legacy = await bench_legacy(nodes, args.requests)
+        pooled = await bench_pooled(nodes, args.requests)
+        print(f"{count:>6} {legacy:>14.0f} {pooled:>14.0f} {pooled / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--requests", type=int, default=10, help="rounds per node")
+    parser.add_argument("--port", type=int, default=18765)
+    parser.add_argument(
+        "--latency", type=float, default=20, help="emulated node RTT in ms"
+    )
+    args = parser.parse_args()
+
+    server = fake_node.start(args.port, args.latency / 1000)
+    time.sleep(0.5)
+    try:
+        asyncio.run(main(args))
+    finally:
+        server.terminate()
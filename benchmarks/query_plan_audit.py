@@ -0,0 +1,248 @@
+"""Check the query plan of every query in backend/db/crud.py.
+
+Calls each crud function on a scratch SQLite database, records the SQL it
+runs and asks SQLite for the plan with EXPLAIN QUERY PLAN. A full scan of
+a table (or of a whole index) fails the audit unless the function is in
+ALLOWED_SCANS with a reason. So is a crud function missing from CALLS, so
+new queries get audited too. Exits non-zero on failure.
+
+The tables are created from the models; `alembic check` keeps the
+migrations in line with them.
+
+Usage (from the repository root):
+    python -m benchmarks.query_plan_audit
+"""
+
+import argparse
+import inspect
+import sqlite3
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import event
+
+from benchmarks import fake_node, scratch_db
+from backend.db import crud
+from backend.db.engine import sessionLocal
+from backend.db.models import Node, NodeHealthHour, NodeHealthMinute, User
+from backend.schema._input import (
+    CreateUser,
+    NodeCreate,
+    SettingsUpdate,
+    UpdateUser,
+    UserFilter,
+)
+
+
+NOW = datetime.now().replace(second=0, microsecond=0)
+EXPIRY = date.today() + timedelta(days=30)
+
+
+def _bucket(node_id: int, minutes_ago: int) -> dict:
+    return {
+        "node_id": node_id,
+        "bucket_start": NOW - timedelta(minutes=minutes_ago),
+        "probes": 1,
+        "up": 1,
+        "latency_sum": 0.05,
+        "latency_histogram": [1, 0, 0],
+    }
+
+
+def _users_after(filters: UserFilter, sort: str, descending: bool):
+    cursor = crud._encode_user_cursor(User(name="user1", expiry_date=EXPIRY), sort)
+    return lambda db: crud.get_users_page(db, filters, 10, sort, descending, cursor)
+
+
+def _node(address: str, port: int) -> NodeCreate:
+    return NodeCreate(
+        name="audit",
+        address=address,
+        tunnel_address="tunnel.example.com",
+        port=port,
+        key="audit-node-key",
+    )
+
+
+# Called in order, writes before the reads that need their rows
+CALLS = {
+    "get_all_users": lambda db: crud.get_all_users(db),
+    "get_users_page": lambda db: [
+        page(db)
+        for page in (
+            _users_after(UserFilter(), "name", False),
+            _users_after(UserFilter(is_active=True), "expiry_date", True),
+            _users_after(UserFilter(expiring_in_days=7), "expiry_date", False),
+            _users_after(UserFilter(search="user", match="contains"), "name", False),
+            lambda db: crud.get_users_page(db, UserFilter(search="user1"), 10),
+        )
+    ],
+    "count_users": lambda db: (
+        crud.count_users(db, UserFilter()),
+        crud.count_users(db, UserFilter(search="user1")),
+    ),
+    "get_user_by_name": lambda db: crud.get_user_by_name(db, "user1"),
+    "create_user": lambda db: crud.create_user(
+        db, CreateUser(name="audit", expiry_date=EXPIRY), "admin"
+    ),
+    "update_user": lambda db: crud.update_user(
+        db, UpdateUser(name="audit", expiry_date=EXPIRY)
+    ),
+    "change_user_status": lambda db: crud.change_user_status(db, "audit", False),
+    "get_expired_users": lambda db: crud.get_expired_users(db),
+    "get_all_admins": lambda db: crud.get_all_admins(db),
+    "it_is_admin": lambda db: crud.it_is_admin(db, "admin"),
+    "get_all_nodes": lambda db: crud.get_all_nodes(db),
+    "get_node_by_id": lambda db: crud.get_node_by_id(db, 1),
+    "get_nodes_by_ids": lambda db: crud.get_nodes_by_ids(db, [1, 2, 3]),
+    "get_node_by_address": lambda db: (
+        crud.get_node_by_address(db, fake_node.node_address(1)),
+        crud.get_node_by_address(db, fake_node.node_address(1), 0),
+    ),
+    "get_node_by_address_and_port": lambda db: crud.get_node_by_address_and_port(
+        db, fake_node.node_address(1), 0
+    ),
+    "create_node": lambda db: crud.create_node(db, _node("audit.example.com", 9000)),
+    "update_node": lambda db: crud.update_node(
+        db,
+        crud.get_node_by_address(db, "audit.example.com").id,
+        _node("audit.example.com", 9001),
+    ),
+    "get_settings": lambda db: crud.get_settings(db),
+    "update_settings": lambda db: crud.update_settings(
+        db, SettingsUpdate(tunnel_address="tunnel.example.com", port=1194, protocol="tcp")
+    ),
+    "update_node_health": lambda db: crud.update_node_health(db, 1, True, 0.05, 0),
+    "update_node_sync_status": lambda db: crud.update_node_sync_status(
+        db, crud.get_node_by_address(db, "audit.example.com").id, "pending"
+    ),
+    "get_healthy_nodes": lambda db: crud.get_healthy_nodes(db),
+    "get_nodes_needing_sync": lambda db: crud.get_nodes_needing_sync(db),
+    "get_download_candidate_nodes": lambda db: crud.get_download_candidate_nodes(db),
+    "set_node_users_state": lambda db: crud.set_node_users_state(
+        db, 1, [(1, "user1"), (2, "user2")], "pending"
+    ),
+    "get_node_users": lambda db: crud.get_node_users(db, 1, ["pending"]),
+    "get_node_user": lambda db: crud.get_node_user(db, 1, 1),
+    "count_node_users": lambda db: crud.count_node_users(db, 1),
+    "get_nodes_with_unconverged_users": lambda db: crud.get_nodes_with_unconverged_users(db),
+    "delete_node_users": lambda db: crud.delete_node_users(db, 1, [2]),
+    "enqueue_node_operations": lambda db: crud.enqueue_node_operations(
+        db, [{"node_id": 1, "user_id": 1, "user_name": "user1", "operation": "create"}]
+    ),
+    "cancel_node_operations": lambda db: crud.cancel_node_operations(
+        db, 2, "user1", "create"
+    ),
+    "claim_node_operations": lambda db: crud.claim_node_operations(db, 10),
+    "set_node_operations_state": lambda db: crud.set_node_operations_state(
+        db, [1], "dead"
+    ),
+    "requeue_running_node_operations": lambda db: crud.requeue_running_node_operations(db),
+    "get_node_operation_user_ids": lambda db: crud.get_node_operation_user_ids(
+        db, 1, ["queued", "running"]
+    ),
+    "get_dead_node_operations": lambda db: crud.get_dead_node_operations(db),
+    "requeue_dead_node_operations": lambda db: crud.requeue_dead_node_operations(db),
+    "get_node_operation_stats": lambda db: crud.get_node_operation_stats(db),
+    "add_node_health_buckets": lambda db: crud.add_node_health_buckets(
+        db, NodeHealthMinute, [_bucket(1, 1), _bucket(2, 1)]
+    ),
+    "get_node_health_buckets": lambda db: (
+        crud.get_node_health_buckets(db, NodeHealthMinute, NOW - timedelta(hours=1), NOW),
+        crud.get_node_health_buckets(
+            db, NodeHealthHour, NOW - timedelta(days=1), NOW, node_id=1
+        ),
+    ),
+    "get_last_node_health_bucket_start": lambda db: crud.get_last_node_health_bucket_start(
+        db, NodeHealthMinute
+    ),
+    "delete_node_health_buckets_before": lambda db: crud.delete_node_health_buckets_before(
+        db, NodeHealthMinute, NOW - timedelta(days=1)
+    ),
+    "delete_user": lambda db: crud.delete_user(db, "audit"),
+    "delete_node": lambda db: crud.delete_node(db, 2),
+}
+
+# Functions whose scan is the point of the query
+ALLOWED_SCANS = {
+    "get_all_users": "returns every user",
+    "count_users": "counts every user matching the filters",
+    "get_all_admins": "returns every admin",
+    "get_all_nodes": "returns every node",
+    "get_settings": "settings has a single row",
+    "update_settings": "settings has a single row",
+    "get_node_operation_stats": "aggregates the whole outbox",
+}
+
+
+def _full_scans(plan: list) -> list:
+    return [
+        detail
+        for detail in plan
+        if detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW"
+    ]
+
+
+def main(args) -> int:
+    functions = {
+        name
+        for name, fn in inspect.getmembers(crud, inspect.isfunction)
+        if fn.__module__ == crud.__name__ and not name.startswith("_")
+    }
+    failures = [f"{name}: not in CALLS" for name in sorted(functions - CALLS.keys())]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "audit.db"
+        scratch_db.use_database(path)
+        scratch_db.seed(args.nodes, args.users, 0)
+        with sessionLocal() as db:
+            # Leave nothing to download from, so the fallback query runs too
+            db.query(Node).update({Node.sync_status: "pending"})
+            db.commit()
+
+        statements = []
+        engine = sessionLocal.kw["bind"]
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            if executemany:
+                parameters = parameters[0]
+            statements.append((statement, parameters))
+
+        explain = sqlite3.connect(path)
+        for name, call in CALLS.items():
+            statements.clear()
+            with sessionLocal() as db:
+                call(db)
+
+            print(name)
+            for statement, parameters in statements:
+                plan = [
+                    row[3]
+                    for row in explain.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                ]
+                scans = _full_scans(plan)
+                if scans and name not in ALLOWED_SCANS:
+                    failures.append(f"{name}: {', '.join(scans)}")
+                if plan:
+                    print(f"  {' '.join(statement.split())[:100]}")
+                    for detail in plan:
+                        print(f"    {detail}")
+        explain.close()
+
+    if failures:
+        print(f"\n{len(failures)} failures:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"\nno full scans outside ALLOWED_SCANS in {len(CALLS)} functions")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--users", type=int, default=100)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+"""Scratch SQLite database for the benchmarks.
+
+Rebinds the panel's session factories to a database file of the
+benchmark's own, so benchmarks never touch data/ov-panel.db.
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks import fake_node
+from backend.config import config
+from backend.db.engine import Base, asyncSessionLocal, configure_sqlite, sessionLocal
+from backend.db.models import Node, User
+from backend.db.writer import writerSessionLocal
+
+
+def use_database(path: Path, tuned: bool = True) -> None:
+    """Point every session factory at ``path`` and create the tables.
+
+    With ``tuned`` off, connections keep SQLite's defaults (rollback
+    journal, full sync) as the panel had before its SQLite profile.
+    """
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}",
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+    )
+    writer_engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=1,
+        max_overflow=0,
+    )
+    if tuned:
+        configure_sqlite(engine)
+        configure_sqlite(async_engine.sync_engine)
+        configure_sqlite(writer_engine, writer=True)
+
+    Base.metadata.create_all(engine)
+    sessionLocal.configure(bind=engine)
+    asyncSessionLocal.configure(bind=async_engine)
+    writerSessionLocal.configure(bind=writer_engine)
+
+
+def seed(nodes: int, users: int, port: int) -> None:
+    """Add users and nodes, the nodes all served by the fake node on ``port``."""
+    db = sessionLocal()
+    expiry = datetime.now().date() + timedelta(days=30)
+    db.add_all(
+        User(name=f"user{i}", expiry_date=expiry, owner="owner") for i in range(users)
+    )
+    db.add_all(
+        Node(
+            name=f"node{i}",
+            address=fake_node.node_address(i),
+            protocol="tcp",
+            ovpn_port=1194,
+            port=port,
+            key="benchmark-key",
+        )
+        for i in range(nodes)
+    )
+    db.commit()
+    db.close()